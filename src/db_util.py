@@ -2,8 +2,7 @@ from dataset import Database, Table
 from dataset.util import ResultIter
 
 
-def create_view_dependant_downloads(db: Database):
-	db.query("""
+DEPENDANT_DOWNLOADS_VIEW = """
 	CREATE VIEW dependant_downloads AS
 	SELECT project_id, name, dependency_project_id, SUM(download_count) AS download_count, timestamp
 	FROM (
@@ -14,7 +13,11 @@ def create_view_dependant_downloads(db: Database):
 		GROUP BY b.project_id, b.file_id, a.dependency_project_id, timestamp
 	)
 	GROUP BY timestamp, dependency_project_id, project_id
-	""")
+"""
+
+
+def create_view_dependant_downloads(db: Database):
+	db.query(DEPENDANT_DOWNLOADS_VIEW)
 
 
 def get_tracked_projects_with_logo(db: Database):
@@ -1,17 +1,26 @@
 import abc
+import bz2
+import hashlib
+import io
 import json
 import logging
 import os
+import threading
+import struct
 import time
 import zipfile
+import zlib
+from collections import OrderedDict
 from enum import unique, IntEnum
-from typing import Optional, List
-from remotezip import RemoteZip, RemoteIOError
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, List, Tuple, Dict, Iterator, Iterable, BinaryIO
+from urllib.parse import urlsplit, urlunsplit, unquote
 import dataset
 import requests
 from dataset import Database, Table
-from furl import furl
-from web_apis import ApiHelper
+from sqlalchemy import text, bindparam
+from rate_limiter import RetryPolicy
+from web_apis import ApiHelper, HttpSessionPool
 
 
 @unique
@@ -40,6 +49,675 @@ class FileIdentifier:
 	def file_id(self):
 		return self._file_id
 
+	def __eq__(self, other):
+		return isinstance(other, FileIdentifier) and self._project_id == other._project_id and self._file_id == other._file_id
+
+	def __hash__(self):
+		return hash((self._project_id, self._file_id))
+
+	def __repr__(self):
+		return f"FileIdentifier({self._project_id}, {self._file_id})"
+
+
+class FileResolutionState:
+	def __init__(self, is_resolved: bool, dependency: Optional[FileIdentifier] = None):
+		"""
+		:param is_resolved: True if all dependencies of the file are known
+		:param dependency: exact file dependency on the queried project, if any
+		"""
+		self.is_resolved: bool = is_resolved
+		self.dependency: Optional[FileIdentifier] = dependency
+
+
+class DependantPlan:
+	"""The files of a dependant, their resolution state and the manifest jobs of the unresolved files"""
+
+	def __init__(self, dependant: dict):
+		self.dependant: dict = dependant
+		self.files: List[Tuple[FileIdentifier, bool]] = []
+		self.jobs: List[ManifestJob] = []
+		self.max_file_id: Optional[int] = None  # highest listed file id, None if the files of the dependant weren't listed
+		self.min_zero_downloads_file_id: Optional[int] = None  # lowest id of the listed files that were skipped for having 0 downloads
+
+
+class ManifestJob:
+	"""A modpack file whose manifest has to be downloaded"""
+
+	def __init__(self, file: FileIdentifier, file_name: str, file_url: str):
+		self.file: FileIdentifier = file
+		self.file_name: str = file_name
+		self.file_url: str = file_url
+
+
+class ManifestResult:
+	"""Outcome of a manifest download, the failure isn't recorded as skipped file if skip_reason is None"""
+
+	def __init__(self, data: Optional[dict] = None, skip_reason: Optional[SkipReason] = None):
+		self.data: Optional[dict] = data
+		self.skip_reason: Optional[SkipReason] = skip_reason
+
+
+class ZipRangeReadError(IOError):
+	pass
+
+
+class ZipManifestParseError(Exception):
+	pass
+
+
+class ZipReadStats:
+	def __init__(self, requests_count: int = 0, bytes_count: int = 0, seconds: float = 0):
+		self.requests: int = requests_count
+		self.bytes: int = bytes_count
+		self.seconds: float = seconds
+
+	def __repr__(self):
+		return f"{self.requests} requests, {self.bytes / 1024:.1f} KiB in {self.seconds:.3f} seconds"
+
+
+class _ChunkStream:
+	"""File-like reads from an iterator of chunks, e.g. a streamed response"""
+
+	def __init__(self, chunks: Iterator[bytes]):
+		self._chunks: Iterator[bytes] = chunks
+		self._pending: bytes = b""
+
+	def read(self, size: int) -> bytes:
+		"""
+		:return: the next `size` bytes, less only at the end of the stream
+		"""
+		while len(self._pending) < size:
+			chunk = next(self._chunks, None)
+			if chunk is None:
+				break
+			self._pending += chunk
+		data, self._pending = self._pending[:size], self._pending[size:]
+		return data
+
+	def skip(self, size: int, chunk_size: int) -> int:
+		"""
+		:return: number of skipped bytes
+		"""
+		skipped = 0
+		while skipped < size:
+			data = self.read(min(chunk_size, size - skipped))
+			if not data:
+				break
+			skipped += len(data)
+		return skipped
+
+
+class ZipManifestReader:
+	"""
+	Reads a single member (e.g. manifest.json) of a remote zip file with as few range requests as possible.
+
+	The first request fetches a generous tail of the file that usually contains the end of central directory record and the whole central directory.
+	The second request streams the local file header together with the compressed data of the member, which is decompressed chunk by chunk.
+	The tail size is adapted per host to the size of the central directories seen so far.
+	"""
+
+	_EOCD = struct.Struct("<4s4H2LH")
+	_ZIP64_EOCD_LOCATOR = struct.Struct("<4sLQL")
+	_ZIP64_EOCD = struct.Struct("<4sQ2H2L4Q")
+	_CENTRAL_FILE_HEADER = struct.Struct("<4s6H3L5H2L")
+	_LOCAL_FILE_HEADER = struct.Struct("<4s5H3L2H")
+
+	def __init__(self, http: HttpSessionPool, default_tail_size: int = 64 * 1024, max_tail_size: int = 1024 * 1024, timeout: float = 30, chunk_size: int = 64 * 1024):
+		"""
+		:param http: connection pool used for the range requests
+		:param default_tail_size: number of bytes that are initially fetched from the end of a file
+		:param max_tail_size: upper bound of the learned per-host tail size
+		:param chunk_size: size of the chunks in which the member is streamed
+		"""
+		self.http: HttpSessionPool = http
+		self.default_tail_size: int = default_tail_size
+		self.max_tail_size: int = max_tail_size
+		self.timeout: float = timeout
+		self.chunk_size: int = chunk_size
+		self.total = ZipReadStats()
+		self.files_read: int = 0
+		self._tail_sizes: Dict[str, int] = {}
+		self._lock = threading.Lock()
+
+	def _request_range(self, url: str, byte_range: str, stats: ZipReadStats, stream: bool = False) -> requests.Response:
+		try:
+			response = self.http.get(url, headers={'Range': f"bytes={byte_range}"}, timeout=self.timeout, stream=stream)
+			response.raise_for_status()
+		except requests.RequestException as error:
+			raise ZipRangeReadError(f"Failed to fetch range {byte_range} of <{url}> -> {error}")
+		stats.requests += 1
+		return response
+
+	@staticmethod
+	def _get_content_range(url: str, response: requests.Response) -> Tuple[int, Optional[int]]:
+		"""
+		:return: the offset of the response data in the file and the file size, None if the server ignored the range and sent the whole file
+		"""
+		if response.status_code != 206:
+			return 0, None
+
+		content_range = response.headers.get('Content-Range', '')  # e.g. "bytes 100-199/1000"
+		try:
+			return int(content_range.split(" ")[1].split("-")[0]), int(content_range.split("/")[1])
+		except (IndexError, ValueError):
+			raise ZipRangeReadError(f"Invalid Content-Range <{content_range}> of <{url}>")
+
+	def _get_range(self, url: str, byte_range: str, stats: ZipReadStats) -> Tuple[bytes, int, int]:
+		"""
+		:return: the data, the offset of the data in the file and the file size
+		"""
+		response = self._request_range(url, byte_range, stats)
+		data = response.content
+		stats.bytes += len(data)
+		start, size = self._get_content_range(url, response)
+		return data, start, size if size is not None else len(data)
+
+	def _iter_range(self, url: str, response: requests.Response, stats: ZipReadStats) -> Iterator[bytes]:
+		try:
+			for chunk in response.iter_content(self.chunk_size):
+				stats.bytes += len(chunk)
+				yield chunk
+		except requests.RequestException as error:
+			raise ZipRangeReadError(f"Failed to read <{url}> -> {error}")
+
+	def read(self, url: str, name: str = "manifest.json") -> Tuple[bytes, ZipReadStats]:
+		"""
+		:return: the decompressed member and the counters of the read
+		:raises ZipRangeReadError: if a request failed
+		:raises ZipManifestParseError: if the file isn't a valid zip file or the member can't be decompressed
+		:raises KeyError: if the zip file doesn't contain the member
+		"""
+		output = io.BytesIO()
+		stats = self.read_into(url, output, name)
+		return output.getvalue(), stats
+
+	def read_into(self, url: str, output: BinaryIO, name: str = "manifest.json") -> ZipReadStats:
+		"""
+		Streams the decompressed member into the file object without holding the whole member in memory,
+		the output contains a partial member if an error is raised
+		:return: the counters of the read
+		:raises ZipRangeReadError: if a request failed
+		:raises ZipManifestParseError: if the file isn't a valid zip file or the member can't be decompressed
+		:raises KeyError: if the zip file doesn't contain the member
+		"""
+		stats = ZipReadStats()
+		start_time = time.perf_counter()
+		for chunk in self._iter_member(url, name, stats):
+			output.write(chunk)
+
+		stats.seconds = time.perf_counter() - start_time
+		with self._lock:
+			self.files_read += 1
+			self.total.requests += stats.requests
+			self.total.bytes += stats.bytes
+			self.total.seconds += stats.seconds
+		return stats
+
+	def _iter_member(self, url: str, name: str, stats: ZipReadStats) -> Iterator[bytes]:
+		# errors of the consumer, e.g. a failed write, are raised in its own frame and thus aren't caught here
+		try:
+			yield from self._iter_member_chunks(url, name, stats)
+		except (ZipRangeReadError, KeyError):
+			raise
+		except (zipfile.BadZipFile, struct.error, UnicodeDecodeError, EOFError, NotImplementedError, OSError, zlib.error) as error:
+			# truncated or malformed archives fail deep inside struct, bz2 or zlib
+			raise ZipManifestParseError(f"Failed to read <{name}> of <{url}> -> {error!r}") from error
+
+	def _iter_member_chunks(self, url: str, name: str, stats: ZipReadStats) -> Iterator[bytes]:
+		host = urlsplit(url).netloc
+		tail_size = self._tail_sizes.get(host, self.default_tail_size)
+
+		buffer, buffer_start, file_size = self._get_range(url, f"-{tail_size}", stats)
+		if buffer_start == 0 and len(buffer) == file_size:
+			# we got the whole file
+			with zipfile.ZipFile(io.BytesIO(buffer)) as z, z.open(name) as member:
+				yield from iter(lambda: member.read(self.chunk_size), b"")
+			return
+
+		cd_offset, cd_size = self._find_central_directory(url, buffer, buffer_start, stats)
+		if cd_offset < buffer_start:
+			missing, _, _ = self._get_range(url, f"{cd_offset}-{buffer_start - 1}", stats)
+			buffer, buffer_start = missing + buffer, cd_offset
+		self._learn_tail_size(host, file_size - cd_offset)
+
+		cd = buffer[cd_offset - buffer_start:cd_offset - buffer_start + cd_size]
+		method, flags, crc, compressed_size, header_offset, name_length, extra_length = self._find_member(cd, name)
+		compressed = self._iter_compressed(url, buffer, buffer_start, file_size, header_offset, name_length + extra_length, compressed_size, stats)
+		data_crc = 0
+		for data in self._decompress(compressed, method, flags):
+			data_crc = zlib.crc32(data, data_crc)
+			yield data
+		if data_crc != crc:
+			raise zipfile.BadZipFile(f"Bad CRC-32 for member <{name}>")
+
+	def _learn_tail_size(self, host: str, required_size: int):
+		"""
+		Grows the tail size of the host when the central directory didn't fit and slowly shrinks it again when much smaller tails would have sufficed
+		"""
+		with self._lock:
+			tail_size = self._tail_sizes.get(host, self.default_tail_size)
+			if required_size > tail_size:
+				while tail_size < required_size and tail_size < self.max_tail_size:
+					tail_size *= 2
+			elif required_size * 4 < tail_size:
+				tail_size = max(self.default_tail_size, tail_size // 2)
+			self._tail_sizes[host] = min(tail_size, self.max_tail_size)
+
+	def _find_central_directory(self, url: str, buffer: bytes, buffer_start: int, stats: ZipReadStats) -> Tuple[int, int]:
+		"""
+		:return: absolute offset and size of the central directory
+		"""
+		eocd_pos = buffer.rfind(b"PK\x05\x06", max(0, len(buffer) - self._EOCD.size - 0xFFFF))
+		if eocd_pos < 0 or eocd_pos + self._EOCD.size > len(buffer):
+			raise zipfile.BadZipFile("End of central directory record not found")
+
+		_, _, _, _, entry_count, cd_size, cd_offset, _ = self._EOCD.unpack_from(buffer, eocd_pos)
+		if entry_count != 0xFFFF and cd_size != 0xFFFFFFFF and cd_offset != 0xFFFFFFFF:
+			return cd_offset, cd_size
+
+		# ZIP64
+		locator_pos = eocd_pos - self._ZIP64_EOCD_LOCATOR.size
+		if locator_pos < 0:
+			raise zipfile.BadZipFile("ZIP64 end of central directory locator not found")
+		signature, _, zip64_eocd_offset, _ = self._ZIP64_EOCD_LOCATOR.unpack_from(buffer, locator_pos)
+		if signature != b"PK\x06\x07":
+			raise zipfile.BadZipFile("ZIP64 end of central directory locator not found")
+
+		if zip64_eocd_offset >= buffer_start:
+			record = buffer[zip64_eocd_offset - buffer_start:zip64_eocd_offset - buffer_start + self._ZIP64_EOCD.size]
+		else:
+			record, _, _ = self._get_range(url, f"{zip64_eocd_offset}-{zip64_eocd_offset + self._ZIP64_EOCD.size - 1}", stats)
+
+		if len(record) < self._ZIP64_EOCD.size or record[:4] != b"PK\x06\x06":
+			raise zipfile.BadZipFile("ZIP64 end of central directory record not found")
+		_, _, _, _, _, _, _, _, cd_size, cd_offset = self._ZIP64_EOCD.unpack(record)
+		return cd_offset, cd_size
+
+	def _find_member(self, cd: bytes, name: str) -> Tuple[int, int, int, int, int, int, int]:
+		"""
+		:return: compression method, flags, crc, compressed size, local header offset, name length and extra length of the member
+		"""
+		pos = 0
+		while pos + self._CENTRAL_FILE_HEADER.size <= len(cd):
+			(signature, _, _, flags, method, _, _, crc, compressed_size, uncompressed_size,
+				name_length, extra_length, comment_length, _, _, _, header_offset) = self._CENTRAL_FILE_HEADER.unpack_from(cd, pos)
+			if signature != b"PK\x01\x02":
+				raise zipfile.BadZipFile("Bad central directory file header")
+
+			name_start = pos + self._CENTRAL_FILE_HEADER.size
+			raw_name = cd[name_start:name_start + name_length]
+			member_name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+			if member_name == name:
+				extra = cd[name_start + name_length:name_start + name_length + extra_length]
+				compressed_size, header_offset = self._apply_zip64_extra(extra, uncompressed_size, compressed_size, header_offset)
+				return method, flags, crc, compressed_size, header_offset, name_length, extra_length
+
+			pos = name_start + name_length + extra_length + comment_length
+
+		raise KeyError(f"There is no item named <{name}> in the archive")
+
+	@staticmethod
+	def _apply_zip64_extra(extra: bytes, uncompressed_size: int, compressed_size: int, header_offset: int) -> Tuple[int, int]:
+		pos = 0
+		while pos + 4 <= len(extra):
+			header_id, data_size = struct.unpack_from("<2H", extra, pos)
+			if header_id == 0x0001:
+				values = extra[pos + 4:pos + 4 + data_size]
+				index = 0
+				# the fields are only present if the corresponding value in the header is 0xFFFFFFFF
+				if uncompressed_size == 0xFFFFFFFF:
+					index += 8
+				if compressed_size == 0xFFFFFFFF:
+					compressed_size = struct.unpack_from("<Q", values, index)[0]
+					index += 8
+				if header_offset == 0xFFFFFFFF:
+					header_offset = struct.unpack_from("<Q", values, index)[0]
+				break
+			pos += 4 + data_size
+		return compressed_size, header_offset
+
+	def _iter_compressed(self, url: str, buffer: bytes, buffer_start: int, file_size: int, header_offset: int, name_extra_length: int, compressed_size: int, stats: ZipReadStats) -> Iterator[bytes]:
+		response = None
+		if header_offset >= buffer_start:
+			chunks, chunks_start = iter((buffer[header_offset - buffer_start:],)), header_offset
+		else:
+			# the extra field of the local header may differ from the one in the central directory, thus we fetch some more bytes
+			expected_end = min(file_size, header_offset + self._LOCAL_FILE_HEADER.size + name_extra_length + compressed_size + 1024)
+			response = self._request_range(url, f"{header_offset}-{expected_end - 1}", stats, stream=True)
+			chunks, chunks_start = self._iter_range(url, response, stats), self._get_content_range(url, response)[0]
+
+		try:
+			stream = _ChunkStream(chunks)
+			stream.skip(header_offset - chunks_start, self.chunk_size)  # a server that ignored the range sends the whole file
+			header = stream.read(self._LOCAL_FILE_HEADER.size)
+			if len(header) < self._LOCAL_FILE_HEADER.size:
+				raise zipfile.BadZipFile("Truncated local file header")
+			signature, _, _, _, _, _, _, _, _, name_length, extra_length = self._LOCAL_FILE_HEADER.unpack(header)
+			if signature != b"PK\x03\x04":
+				raise zipfile.BadZipFile("Bad local file header")
+
+			stream.skip(name_length + extra_length, self.chunk_size)
+			remaining = compressed_size
+			while remaining > 0:
+				chunk = stream.read(min(self.chunk_size, remaining))
+				if not chunk:
+					break
+				remaining -= len(chunk)
+				yield chunk
+		finally:
+			if response is not None:
+				response.close()
+
+		if remaining > 0:
+			# the local extra field was larger than expected
+			data_end = header_offset + self._LOCAL_FILE_HEADER.size + name_length + extra_length + compressed_size
+			response = self._request_range(url, f"{data_end - remaining}-{data_end - 1}", stats, stream=True)
+			try:
+				yield from self._iter_range(url, response, stats)
+			finally:
+				response.close()
+
+	@staticmethod
+	def _decompress(chunks: Iterator[bytes], method: int, flags: int) -> Iterator[bytes]:
+		if flags & 0x1:
+			raise zipfile.BadZipFile("Encrypted members are not supported")
+		if method == zipfile.ZIP_STORED:
+			yield from chunks
+		elif method == zipfile.ZIP_DEFLATED:
+			decompressor = zlib.decompressobj(-15)
+			for chunk in chunks:
+				yield decompressor.decompress(chunk)
+			yield decompressor.flush()
+		elif method == zipfile.ZIP_BZIP2:
+			decompressor = bz2.BZ2Decompressor()
+			for chunk in chunks:
+				yield decompressor.decompress(chunk)
+			if not decompressor.eof:
+				raise EOFError("Compressed data ended before the end-of-stream marker was reached")
+		else:
+			raise zipfile.BadZipFile(f"Unsupported compression method {method}")
+
+
+class CdnUrlResolver:
+	"""
+	Resolves the final url of CDN download urls, so that the range requests of a manifest download don't each follow the redirect.
+
+	The edge CDN redirects to a host that serves the file under the same path.
+	Once such a redirect was observed, urls of the same origin are rewritten directly instead of sending a HEAD request per file.
+	If a rewritten url doesn't work the caller can invalidate it and resolve it again with a HEAD request.
+	"""
+
+	def __init__(self, http: HttpSessionPool, max_cached_urls: int = 10000):
+		self.http: HttpSessionPool = http
+		self.max_cached_urls: int = max_cached_urls
+		self.head_requests: int = 0
+		self.rewrites: int = 0
+		self._origin_rewrites: Dict[str, str] = {}
+		self._resolved_urls: OrderedDict = OrderedDict()  # url -> (resolved url, was rewritten)
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def _split_origin(url: str) -> Tuple[str, str]:
+		parts = urlsplit(url)
+		return f"{parts.scheme}://{parts.netloc}", urlunsplit(('', '', parts.path, parts.query, parts.fragment))
+
+	def _cache(self, url: str, resolved_url: str, was_rewritten: bool):
+		self._resolved_urls[url] = (resolved_url, was_rewritten)
+		self._resolved_urls.move_to_end(url)
+		while len(self._resolved_urls) > self.max_cached_urls:
+			self._resolved_urls.popitem(last=False)
+
+	def resolve(self, url: str) -> str:
+		"""
+		:raises GetRedirectedUrlError:
+		"""
+		origin, path = self._split_origin(url)
+		with self._lock:
+			if url in self._resolved_urls:
+				self._resolved_urls.move_to_end(url)  # keeps the least recently used urls at the front, which are evicted first
+				return self._resolved_urls[url][0]
+			if origin in self._origin_rewrites:
+				self.rewrites += 1
+				resolved_url = self._origin_rewrites[origin] + path
+				self._cache(url, resolved_url, True)
+				return resolved_url
+			self.head_requests += 1
+
+		try:
+			response = self.http.head(url, allow_redirects=True)
+			response.raise_for_status()
+		except requests.RequestException as error:
+			raise GetRedirectedUrlError(f"Failed to get resultant url for <{url}> -> {error}")
+
+		resolved_origin, resolved_path = self._split_origin(response.url)
+		with self._lock:
+			if resolved_origin != origin and unquote(resolved_path) == unquote(path):
+				self._origin_rewrites[origin] = resolved_origin
+			self._cache(url, response.url, False)
+		return response.url
+
+	def invalidate(self, url: str) -> bool:
+		"""
+		Removes the cached url and the origin rewrite that produced it
+		:return: True if the url was resolved by rewriting it, i.e. resolving it again with a HEAD request might succeed
+		"""
+		with self._lock:
+			_, was_rewritten = self._resolved_urls.pop(url, (None, False))
+			if was_rewritten:
+				self._origin_rewrites.pop(self._split_origin(url)[0], None)
+			return was_rewritten
+
+
+class FileRecordCache:
+	"""
+	Bounded LRU store of the file records that were listed during a run,
+	lets the caller persist the file info of dependents without querying the same files again.
+	"""
+
+	def __init__(self, max_records: int = 50000):
+		self.max_records: int = max_records
+		self.hits: int = 0
+		self.misses: int = 0
+		self._records: OrderedDict = OrderedDict()  # file -> file record
+		self._lock = threading.Lock()
+
+	def put_many(self, records: List[dict]):
+		with self._lock:
+			for record in records:
+				file = FileIdentifier(record['modId'], record['id'])
+				self._records[file] = record
+				self._records.move_to_end(file)
+			while len(self._records) > self.max_records:
+				self._records.popitem(last=False)
+
+	def pop_many(self, files: List[FileIdentifier]) -> Dict[FileIdentifier, dict]:
+		"""
+		Removes and returns the cached records of the files, files that aren't cached are missing in the result
+		"""
+		records = {}
+		with self._lock:
+			for file in files:
+				record = self._records.pop(file, None)
+				if record is not None:
+					records[file] = record
+		self.hits += len(records)
+		self.misses += len(files) - len(records)
+		return records
+
+	def clear(self):
+		with self._lock:
+			self._records.clear()
+
+
+def _insert_ignore_statement(db: Database, table: Table):
+	"""Insert statement that skips rows which violate a unique constraint"""
+	if db.engine.dialect.name == "postgresql":
+		from sqlalchemy.dialects.postgresql import insert
+		return insert(table.table).on_conflict_do_nothing()
+	return table.table.insert().prefix_with("OR IGNORE", dialect="sqlite").prefix_with("IGNORE", dialect="mysql")
+
+
+class DependencySetStore:
+	"""
+	Compact storage of the dependencies of modpack files.
+
+	Identical dependency sets are stored once and referenced by the `file` table via `dependency_set_id`.
+	A new set that differs only slightly from the latest set of the same modpack is stored as delta (added and removed entries)
+	to that parent set, other sets are stored in full. Delta chains are limited to `max_depth` parents.
+	"""
+
+	def __init__(self, db: Database, max_depth: int = 16, max_delta_ratio: float = 0.5, cache_size: int = 64):
+		"""
+		:param db:
+		:param max_depth: max number of deltas between a set and its full base set
+		:param max_delta_ratio: max size of a delta relative to the size of the full set
+		:param cache_size: number of materialized sets that are kept in memory
+		"""
+		self.db: Database = db
+		self.max_depth: int = max_depth
+		self.max_delta_ratio: float = max_delta_ratio
+		self.cache_size: int = cache_size
+		self._sets: OrderedDict = OrderedDict()  # set id -> frozenset of (project id, file id) pairs
+		self._parents: Dict[int, Tuple[Optional[int], int]] = {}  # set id -> (parent id, depth)
+
+	def init_db(self):
+		db = self.db
+		if not db.has_table('dependency_set'):
+			table: Table = db.create_table('dependency_set')
+			table.create_column('hash', db.types.string)
+			table.create_column('parent_id', db.types.integer)
+			table.create_column('depth', db.types.integer)
+			table.create_column('size', db.types.integer)
+			table.create_index(['hash'], name='dependency_set_hash', unique=True)
+
+		if not db.has_table('dependency_set_entry'):
+			table: Table = db.create_table('dependency_set_entry', primary_id=False)
+			table.create_column('set_id', db.types.integer)
+			table.create_column('dependency_project_id', db.types.integer)
+			table.create_column('dependency_file_id', db.types.integer)
+			table.create_column('removed', db.types.boolean)
+			table.create_index(['set_id', 'dependency_project_id'])
+
+		if 'dependency_set_id' not in db['file'].columns:
+			db['file'].create_column('dependency_set_id', db.types.integer)
+
+	@staticmethod
+	def get_hash(dependencies: frozenset) -> str:
+		return hashlib.sha1("\n".join(f"{p}:{f}" for p, f in sorted(dependencies)).encode()).hexdigest()
+
+	def _load_parents(self, set_ids: set):
+		missing = [set_id for set_id in set_ids if set_id not in self._parents]
+		while len(missing) > 0:
+			chunk, missing = missing[:500], missing[500:]
+			for row in self.db['dependency_set'].find(id=chunk):
+				self._parents[row['id']] = (row['parent_id'], row['depth'])
+				if row['parent_id'] is not None and row['parent_id'] not in self._parents:
+					missing.append(row['parent_id'])
+
+	def _get_chain(self, set_id: int) -> List[int]:
+		"""
+		:return: the set id followed by the ids of its parents
+		"""
+		self._load_parents({set_id})
+		chain = []
+		while set_id is not None:
+			chain.append(set_id)
+			set_id = self._parents[set_id][0]
+		return chain
+
+	def materialize(self, set_id: int) -> frozenset:
+		if set_id in self._sets:
+			self._sets.move_to_end(set_id)
+			return self._sets[set_id]
+
+		chain = self._get_chain(set_id)
+		entries = {}
+		for row in self.db['dependency_set_entry'].find(set_id=chain):
+			entries.setdefault(row['set_id'], []).append(row)
+
+		dependencies = set()
+		for chain_set_id in reversed(chain):  # apply the deltas starting at the full base set
+			for row in entries.get(chain_set_id, []):
+				pair = (row['dependency_project_id'], row['dependency_file_id'])
+				if row['removed']:
+					dependencies.discard(pair)
+				else:
+					dependencies.add(pair)
+
+		result = frozenset(dependencies)
+		self._sets[set_id] = result
+		while len(self._sets) > self.cache_size:
+			self._sets.popitem(last=False)
+		return result
+
+	def store(self, project_id: int, dependencies: frozenset) -> int:
+		"""
+		Stores the dependency set of a file of the given modpack if it isn't stored yet
+		:return: id of the dependency set
+		"""
+		set_hash = self.get_hash(dependencies)
+		existing = self.db['dependency_set'].find_one(hash=set_hash)
+		if existing:
+			return existing['id']
+
+		parent_id, depth, entries = None, 0, [(p, f, False) for p, f in dependencies]
+		latest = self.db.query("""
+			SELECT dependency_set_id FROM file
+				WHERE project_id = :project_id AND dependency_set_id IS NOT NULL
+				ORDER BY file_id DESC LIMIT 1
+		""", project_id=project_id)
+		for row in latest:
+			candidate_id = row['dependency_set_id']
+			self._load_parents({candidate_id})
+			candidate_depth = self._parents[candidate_id][1]
+			parent = self.materialize(candidate_id)
+			added, removed = dependencies - parent, parent - dependencies
+			if candidate_depth < self.max_depth and len(added) + len(removed) <= len(dependencies) * self.max_delta_ratio:
+				parent_id, depth = candidate_id, candidate_depth + 1
+				entries = [(p, f, False) for p, f in added] + [(p, f, True) for p, f in removed]
+
+		# another process may have stored the same set since the lookup, in that case its set is used
+		result = self.db.executable.execute(
+			_insert_ignore_statement(self.db, self.db['dependency_set']),
+			dict(hash=set_hash, parent_id=parent_id, depth=depth, size=len(dependencies))
+		)
+		set_id = self.db['dependency_set'].find_one(hash=set_hash)['id']
+		if result.rowcount == 0:
+			return set_id
+
+		self._parents[set_id] = (parent_id, depth)
+		if len(entries) > 0:
+			self.db.executable.execute(self.db['dependency_set_entry'].table.insert(), [
+				dict(set_id=set_id, dependency_project_id=p, dependency_file_id=f, removed=is_removed) for p, f, is_removed in entries
+			])
+		return set_id
+
+	def get_dependencies_on_project(self, set_ids: set, project_id: int) -> Dict[int, Optional[int]]:
+		"""
+		:return: mapping of set id to the file id of the dependency on the given project, or None if the set doesn't depend on the project
+		"""
+		self._load_parents(set_ids)
+		chain_ids = set()
+		for set_id in set_ids:
+			chain_ids.update(self._get_chain(set_id))
+
+		entries = {}
+		chain_ids = list(chain_ids)
+		for i in range(0, len(chain_ids), 500):
+			for row in self.db['dependency_set_entry'].find(dependency_project_id=project_id, set_id=chain_ids[i:i + 500]):
+				entries.setdefault(row['set_id'], []).append(row)
+
+		dependencies = {}
+		for set_id in set_ids:
+			dependencies[set_id] = None
+			for chain_set_id in self._get_chain(set_id):  # the closest set that mentions the project decides
+				rows = entries.get(chain_set_id)
+				if rows:
+					added = [row['dependency_file_id'] for row in rows if not row['removed']]
+					dependencies[set_id] = added[0] if len(added) > 0 else None
+					break
+		return dependencies
+
 
 class DependencyResolverInterface(metaclass=abc.ABCMeta):
 
@@ -79,8 +757,64 @@ class DependencyResolverInterface(metaclass=abc.ABCMeta):
 		"""
 		raise NotImplementedError
 
+	def get_dependents_of_projects(self, projects: List[dict]) -> [list, List[FileIdentifier]]:
+		"""
+		Get all files that depend on at least one of the projects, every dependant is resolved only once
+		:param projects: dicts with the id, name and slug of each project
+		:return: list of dependents and list of file dependents
+		"""
+		all_dependents, all_files = {}, {}
+		for project in projects:
+			dependents, files = self.get_project_dependents(project['id'], project['name'], project['slug'])
+			all_dependents.update((dependant['id'], dependant) for dependant in dependents)
+			all_files.update(dict.fromkeys(files))
+		return list(all_dependents.values()), list(all_files)
+
+	def iter_dependents_of_projects(self, projects: List[dict]) -> Iterator[Tuple[dict, List[FileIdentifier]]]:
+		"""
+		Like `get_dependents_of_projects`, but yields every dependant with its file dependents as soon as it is resolved.
+		By default the dependents are yielded project by project, a dependant of several projects is yielded again with the files that weren't yielded yet.
+		:param projects: dicts with the id, name and slug of each project
+		:return: iterator of (dependant, file dependents)
+		"""
+		yielded_dependents, yielded_files = set(), set()
+		for project in projects:
+			dependents, files = self.get_project_dependents(project['id'], project['name'], project['slug'])
+			files_by_project = {}
+			for file in files:
+				if file not in yielded_files:
+					yielded_files.add(file)
+					files_by_project.setdefault(file.project_id, []).append(file)
+			for dependant in dependents:
+				new_files = files_by_project.get(dependant['id'], [])
+				if dependant['id'] not in yielded_dependents or len(new_files) > 0:
+					yielded_dependents.add(dependant['id'])
+					yield dependant, new_files
+
+	def pop_file_records(self, files: List[FileIdentifier]) -> Dict[FileIdentifier, dict]:
+		"""
+		Returns the CFCore file records that the resolver already fetched for the files, so the caller doesn't have to query them again
+		:param files:
+		:return: records of the files that are still known, the records are handed over only once
+		"""
+		return {}
+
+	@abc.abstractmethod
+	def get_files_resolution_state(self, files: List[FileIdentifier], project_id: Optional[int] = None) -> Dict[FileIdentifier, FileResolutionState]:
+		"""
+		Bulk lookup whether the dependencies of the files are resolved and, if project_id is given, their exact file dependency on that project
+		:param files:
+		:param project_id:
+		:return: state of every given file
+		"""
+		raise NotImplementedError
+
 
 class DependencyResolver(DependencyResolverInterface):
+	# reasons that don't go away by retrying the same file, these files are given up on after some attempts
+	permanent_skip_reasons = frozenset({SkipReason.FILE_PARSING_ERROR, SkipReason.MOD_DISTRIBUTION_NOT_ALLOWED})
+	# reasons that are retried by `retry_skipped_files` by default
+	retryable_skip_reasons = [SkipReason.DOWNLOAD_ERROR, SkipReason.FILE_PARSING_ERROR, SkipReason.DOWNLOAD_TOO_LARGE]
 
 	def __init__(self, api_helper: ApiHelper, logger: logging.Logger, db_url="sqlite:///dependencies.db", **kwargs):
 		self.logger: logging.Logger = logger
@@ -88,8 +822,20 @@ class DependencyResolver(DependencyResolverInterface):
 		self.bypass_distribution_restriction: bool = kwargs.get("bypass_distribution_restriction", False)
 		self.use_webscraper: bool = kwargs.get("use_webscraper", False)
 		self.skip_zero_downloads: bool = kwargs.get("skip_zero_downloads", False)
+		self.in_memory_manifest: bool = kwargs.get("in_memory_manifest", False)  # read the manifest straight into memory instead of streaming it to the temp folder
 		self.tempFolderPath: str = kwargs.get("temp_download_folder_path", "/temp")
+		self.max_workers: int = kwargs.get("max_workers", 1)  # number of manifests that are downloaded concurrently
+		self.use_watermarks: bool = kwargs.get("use_watermarks", False)  # only list the files of dependents that changed since the last run
+		self.compact_storage: bool = kwargs.get("compact_storage", False)  # store deduplicated dependency sets instead of one dependency row per file and mod
+		# backoff schedule of skipped files, the delay doubles with every failed attempt
+		self.skip_retry_policy: RetryPolicy = kwargs.get("skip_retry_policy", RetryPolicy(max_retries=5, backoff_base=3600, backoff_max=7 * 24 * 3600))
+		self.manifest_archive = kwargs.get("manifest_archive", None)  # optional manifest_archive.ManifestArchive, checked before downloading a manifest
+		self.job_queue = kwargs.get("job_queue", None)  # optional job_queue.JobQueue, lets several processes resolve the manifests and makes runs resumable
+		self.file_records = FileRecordCache(kwargs.get("max_cached_file_records", 50000))  # file records listed during the current run
+		self.cdn_url_resolver = CdnUrlResolver(api_helper.http)
+		self.manifest_reader = ZipManifestReader(api_helper.http)
 		self.db: Database = dataset.connect(db_url)
+		self.dependency_sets = DependencySetStore(self.db)
 		self._init_db()
 
 	def __exit__(self, exc_type, exc_val, exc_tb):
@@ -119,21 +865,93 @@ class DependencyResolver(DependencyResolverInterface):
 			table.create_column('dependency_file_id', db.types.integer)
 			table.create_index(['project_id', 'file_id', 'dependency_project_id'])
 
+		table: Table = db['skipped_file']
+		if not table.has_column('attempts'):
+			table.create_column('attempts', db.types.integer)
+			table.create_column('next_attempt', db.types.integer)
+			table.create_column('file_name', db.types.string)
+			# rows of older versions are eligible for a retry right away
+			db.query("UPDATE skipped_file SET attempts = 1, next_attempt = 0 WHERE attempts IS NULL")
+
+		# create the indices of the upsert keys upfront, dataset would otherwise create them lazily inside the write transactions
+		db['file'].create_index(['project_id', 'file_id'])
+		db['skipped_file'].create_index(['project_id', 'file_id'])
+
+		# the unique constraint lets us insert the dependencies of a manifest with one "insert or ignore" statement
+		db['dependency'].create_index(['project_id', 'file_id', 'dependency_project_id', 'dependency_file_id'], name='dependency_unique', unique=True)
+
+		self.dependency_sets.init_db()
+
+		if not db.has_table('dependent_watermark'):
+			table: Table = db.create_table('dependent_watermark', primary_id='project_id', primary_type=db.types.integer)
+			table.create_column('date_modified', db.types.string)
+			table.create_column('max_file_id', db.types.integer)
+			table.create_column('timestamp', db.types.integer)
+
 	def is_file_depending_on_project(self, file: FileIdentifier, project_id: int) -> bool:
-		if self.db['dependency'].find_one(project_id=file.project_id, file_id=file.file_id, dependency_project_id=project_id):
-			return True
-		return False
+		return self.get_file_dependency(file, project_id) is not None
 
 	def get_file_dependency(self, file: FileIdentifier, project_id: int) -> Optional[FileIdentifier]:
-		result = self.db['dependency'].find_one(project_id=file.project_id, file_id=file.file_id, dependency_project_id=project_id)
-		if result:
-			return FileIdentifier(project_id, result['dependency_file_id'])
-		return None
+		return self.get_files_resolution_state([file], project_id)[file].dependency
+
+	def get_files_resolution_state(self, files: List[FileIdentifier], project_id: Optional[int] = None) -> Dict[FileIdentifier, FileResolutionState]:
+		states = {file: FileResolutionState(False) for file in files}
+
+		file_ids_by_project = {}
+		for file in states:
+			file_ids_by_project.setdefault(file.project_id, []).append(file.file_id)
+
+		files_by_set_id = {}  # files stored in compact form
+		# with project_id None the CASE never matches, thus the dependency file id is NULL
+		query = text("""
+			SELECT f.file_id, f.dependency_count, f.dependency_set_id, COUNT(d.file_id) AS resolved_count,
+				MAX(CASE WHEN d.dependency_project_id = :dependency_project_id THEN d.dependency_file_id END) AS dependency_file_id
+				FROM file f
+					LEFT JOIN dependency d ON d.project_id = f.project_id AND d.file_id = f.file_id
+				WHERE f.project_id = :project_id AND f.file_id IN :file_ids
+				GROUP BY f.project_id, f.file_id
+		""").bindparams(bindparam('file_ids', expanding=True))
+		for dependant_id, file_ids in file_ids_by_project.items():
+			for i in range(0, len(file_ids), 500):
+				rows = self.db.query(query, dependency_project_id=project_id, project_id=dependant_id, file_ids=file_ids[i:i + 500])
+				for row in rows:
+					file = FileIdentifier(dependant_id, row['file_id'])
+					if row['dependency_set_id'] is not None:
+						files_by_set_id.setdefault(row['dependency_set_id'], []).append(file)
+						states[file] = FileResolutionState(True)
+						continue
+					dependency = FileIdentifier(project_id, row['dependency_file_id']) if row['dependency_file_id'] is not None else None
+					states[file] = FileResolutionState(row['resolved_count'] == row['dependency_count'], dependency)
+
+		if project_id is not None and len(files_by_set_id) > 0:
+			for set_id, dependency_file_id in self.dependency_sets.get_dependencies_on_project(set(files_by_set_id), project_id).items():
+				if dependency_file_id is not None:
+					for file in files_by_set_id[set_id]:
+						states[file].dependency = FileIdentifier(project_id, dependency_file_id)
+
+		return states
+
+	def compact_dependencies(self):
+		"""
+		Converts the dependency rows of all files into the compact form of the DependencySetStore
+		"""
+		rows = self.db.query("SELECT DISTINCT project_id, file_id FROM dependency ORDER BY project_id, file_id")
+		files = [FileIdentifier(row['project_id'], row['file_id']) for row in rows]
+		self.logger.info(f"Compacting the dependencies of {len(files)} files...")
+		for file in files:
+			with self.db:
+				dependencies = frozenset(
+					(row['dependency_project_id'], row['dependency_file_id'])
+					for row in self.db['dependency'].find(project_id=file.project_id, file_id=file.file_id)
+				)
+				set_id = self.dependency_sets.store(file.project_id, dependencies)
+				self.db['file'].update(dict(project_id=file.project_id, file_id=file.file_id, dependency_set_id=set_id), ['project_id', 'file_id'])
+				self.db['dependency'].delete(project_id=file.project_id, file_id=file.file_id)
 
 	def _get_mod_dependents_with_web_scraping(self, project_slug: str) -> Optional[List[int]]:
 		self.logger.info(f'Using Playwright to web scrape dependents from CF...')
 		ids = []
-		for slug, _id in self.apiHelper.get_mod_dependents_by_web_scrapping(project_slug):
+		for slug, _id in self.apiHelper.get_mod_dependents_by_web_scrapping(project_slug).items():
 			if not _id:
 				self.logger.error(f"Failed to find project id for slug <{slug}>")
 				continue
@@ -141,199 +959,499 @@ class DependencyResolver(DependencyResolverInterface):
 
 		return ids if len(ids) > 0 else None
 
-	def get_project_dependents(self, project_id: int, project_name: str, project_slug: str) -> [list, List[FileIdentifier]]:
+	def _iter_dependents_ids(self, project_id: int, project_name: str, project_slug: str) -> Iterator[int]:
 		if self.use_webscraper:
-			dependents_ids = self._get_mod_dependents_with_web_scraping(project_slug)
-		else:
-			dependents_ids = self.apiHelper.get_mod_dependents_from_mpi(project_id, project_name)
-
-		if not dependents_ids:
-			self.logger.warning("No Dependents Found")
-			return [], []
+			yield from self._get_mod_dependents_with_web_scraping(project_slug) or []
+			return
+		yield from self.apiHelper.iter_mod_dependents_from_mpi(project_id, project_name)
 
-		self.logger.info(f'Found {len(dependents_ids)} dependents')
-		try:
-			response = self.apiHelper.cf_api.get_projects(dependents_ids)
-			response.raise_for_status()
-			dependents = response.json()["data"]
-		except requests.RequestException as error:
-			self.logger.error(f"Failed to query dependents info for project id <{project_id}> -> CFCore API: {error}")
-			return [], []
+	def get_project_dependents(self, project_id: int, project_name: str, project_slug: str) -> [list, List[FileIdentifier]]:
+		return self.get_dependents_of_projects([dict(id=project_id, name=project_name, slug=project_slug)])
 
-		resolved_files = []
+	def get_dependents_of_projects(self, projects: List[dict]) -> [list, List[FileIdentifier]]:
 		resolved_dependents = []
+		resolved_files = []
+		for dependant, files in self.iter_dependents_of_projects(projects):
+			resolved_dependents.append(dependant)
+			resolved_files.extend(files)
+		return resolved_dependents, resolved_files
+
+	def iter_dependents_of_projects(self, projects: List[dict]) -> Iterator[Tuple[dict, List[FileIdentifier]]]:
+		self.file_records.clear()
+		yield from self._iter_resolved_dependents(self._iter_dependents(projects))
+
+	def _iter_dependents(self, projects: List[dict]) -> Iterator[dict]:
+		"""
+		Streams the infos of the distinct dependents of all projects.
+		The dependents ids are consumed while they are found and their infos are queried in chunks of `bulk_chunk_size`,
+		thus the first dependents are resolved before all pages of dependents are listed.
+		"""
+		chunk_size = self.apiHelper.cf_api.bulk_chunk_size
+		dependents_ids = set()  # union of the dependents of all projects
+		chunk = []
+		for project in projects:
+			count = 0
+			try:
+				for _id in self._iter_dependents_ids(project['id'], project['name'], project['slug']):
+					count += 1
+					if _id in dependents_ids:
+						continue
+					dependents_ids.add(_id)
+					chunk.append(_id)
+					if len(chunk) >= chunk_size:
+						yield from self._get_dependents_info(chunk)
+						chunk = []
+			except requests.RequestException as error:
+				self.logger.error(f"Failed to query the dependents of <{project['name']}> -> ModpackIndex API: {error}")
+
+			if count == 0:
+				self.logger.warning(f"No Dependents Found for <{project['name']}>")
+			else:
+				self.logger.info(f"Found {count} dependents for <{project['name']}>")
+
+		if len(chunk) > 0:
+			yield from self._get_dependents_info(chunk)
+		if len(projects) > 1 and len(dependents_ids) > 0:
+			self.logger.info(f'Found {len(dependents_ids)} distinct dependents')
+
+	def _get_dependents_info(self, ids: List[int]) -> List[dict]:
+		result = self.apiHelper.cf_api.get_projects_chunked(ids)
+		for failed_ids, error in result.errors:
+			self.logger.error(f"Failed to query info of {len(failed_ids)} dependents -> CFCore API: {error}")
+		return result.data if result.data else []
+
+	def _iter_resolved_dependents(self, dependents: Iterable[dict]) -> Iterator[Tuple[dict, List[FileIdentifier]]]:
+		"""
+		Resolves the file dependencies of the dependents and yields every dependant as soon as all of its manifests are resolved.
+		With more than one worker the manifests are downloaded concurrently while the next dependents are listed,
+		at most `max_workers * 4` manifests are in flight and all db writes happen on the calling thread.
+		If a job queue is configured the manifests are resolved through the queue, together with all other workers of the queue.
+		"""
+		if self.job_queue is not None:
+			yield from self._iter_resolved_dependents_with_queue(dependents)
+			return
+
+		resolved_jobs = set()
+		executor = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+		futures = {}
+		remaining_jobs = {}  # number of unfinished jobs per plan
+		try:
+			for dependant in dependents:
+				plan = self._plan_project_dependencies(dependant)
+				if not executor or len(plan.jobs) == 0:
+					for job in plan.jobs:
+						if self._store_manifest_result(job, self._fetch_manifest(job)):
+							resolved_jobs.add(job.file)
+					yield from self._finish_plan(plan, resolved_jobs)
+					continue
+
+				remaining_jobs[plan] = len(plan.jobs)
+				for job in plan.jobs:
+					while len(futures) >= self.max_workers * 4:
+						yield from self._store_completed_jobs(futures, remaining_jobs, resolved_jobs)
+					futures[executor.submit(self._fetch_manifest, job)] = (job, plan)
+
+			while len(futures) > 0:
+				yield from self._store_completed_jobs(futures, remaining_jobs, resolved_jobs)
+		finally:
+			if executor:
+				executor.shutdown(cancel_futures=True)
+
+	def _store_completed_jobs(self, futures: dict, remaining_jobs: dict, resolved_jobs: set) -> Iterator[Tuple[dict, List[FileIdentifier]]]:
+		"""
+		Waits for at least one job, stores the results of all completed jobs and yields the dependents that are finished
+		"""
+		done, _ = wait(futures, return_when=FIRST_COMPLETED)
+		for future in done:
+			job, plan = futures.pop(future)
+			if self._store_manifest_result(job, future.result()):
+				resolved_jobs.add(job.file)
+			remaining_jobs[plan] -= 1
+			if remaining_jobs[plan] == 0:
+				del remaining_jobs[plan]
+				yield from self._finish_plan(plan, resolved_jobs)
+
+	def _finish_plan(self, plan: DependantPlan, resolved_jobs: set) -> Iterator[Tuple[dict, List[FileIdentifier]]]:
+		if self.use_watermarks and all(job.file in resolved_jobs for job in plan.jobs):
+			self._update_watermark(plan)
+
+		dependencies = [file for file, is_resolved in plan.files if is_resolved or file in resolved_jobs]
+		resolved_jobs.difference_update(job.file for job in plan.jobs)
+		if len(dependencies) > 0:
+			yield plan.dependant, dependencies
+
+	def _iter_resolved_dependents_with_queue(self, dependents: Iterable[dict]) -> Iterator[Tuple[dict, List[FileIdentifier]]]:
+		queued_plans = []
 		for dependant in dependents:
-			dependencies = self._resolve_project_dependencies(dependant)
-			if len(dependencies) > 0:
-				resolved_dependents.append(dependant)
-				for dependency in dependencies:
-					resolved_files.append(dependency)
+			plan = self._plan_project_dependencies(dependant)
+			if len(plan.jobs) == 0:
+				yield from self._finish_plan(plan, set())
+				continue
+			self.job_queue.put_many(plan.jobs)
+			queued_plans.append(plan)
+		if len(queued_plans) == 0:
+			return
 
-		return resolved_dependents, resolved_files
+		# the queue is worked until the jobs of our dependents are finished, the jobs of other collections are left to their workers
+		work = self._iter_work_queue(wait=True)
+		try:
+			for _ in work:
+				yield from self._finish_queued_plans(queued_plans)
+				if len(queued_plans) == 0:
+					return
+		finally:
+			work.close()
+		yield from self._finish_queued_plans(queued_plans)
+
+	def _finish_queued_plans(self, plans: List[DependantPlan]) -> Iterator[Tuple[dict, List[FileIdentifier]]]:
+		"""
+		Yields the dependents whose jobs are all finished, by this or by other workers, and removes their plans from the list
+		"""
+		unfinished = self.job_queue.get_unfinished([job.file for plan in plans for job in plan.jobs])
+		finished = [plan for plan in plans if not any(job.file in unfinished for job in plan.jobs)]
+		if len(finished) == 0:
+			return
+		plans[:] = [plan for plan in plans if any(job.file in unfinished for job in plan.jobs)]
+
+		# the jobs may have been resolved by other workers, thus the db is the source of truth
+		states = self.get_files_resolution_state([job.file for plan in finished for job in plan.jobs])
+		resolved_jobs = {file for file, state in states.items() if state.is_resolved}
+		for plan in finished:
+			yield from self._finish_plan(plan, resolved_jobs)
+
+	def work_queue(self, wait: bool = False, poll_interval: float = 5) -> int:
+		"""
+		Claims and resolves jobs of the job queue until no job is left.
+		Can be run by several processes that share the job queue and the db, e.g. to help a running collection.
+		:param wait: keep polling while jobs are leased by other workers, so that all jobs are finished when the method returns
+		:param poll_interval: seconds between polls
+		:return: number of jobs resolved by this worker
+		"""
+		return sum(self._iter_work_queue(wait, poll_interval))
 
-	def _are_file_dependencies_resolved(self, file: FileIdentifier) -> bool:
-		result = self.db['file'].find_one(project_id=file.project_id, file_id=file.file_id)
-		if result:
-			target = result['dependency_count']
-			resolved = self.db['dependency'].count(project_id=file.project_id, file_id=file.file_id)
-			if resolved == target:
-				return True
+	def _iter_work_queue(self, wait: bool = False, poll_interval: float = 5) -> Iterator[int]:
+		"""
+		Works the job queue like `work_queue`, yields the number of resolved jobs after every claimed batch and every poll
+		"""
+		if self.job_queue is None:
+			raise ValueError("'job_queue' isn't configured")
 
-		return False
+		executor = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+		stop_lease_renewal = self.job_queue.start_lease_renewal()
+		try:
+			while True:
+				jobs = self.job_queue.claim(self.max_workers * 2)
+				if len(jobs) == 0:
+					if wait and self.job_queue.has_unfinished_jobs():
+						time.sleep(poll_interval)
+						yield 0
+						continue
+					break
+
+				resolved = 0
+				results = executor.map(self._fetch_manifest, jobs) if executor else map(self._fetch_manifest, jobs)
+				for job, result in zip(jobs, results):
+					if self._store_manifest_result(job, result):
+						owned = self.job_queue.complete(job)
+						resolved += 1
+					else:
+						# only download errors are worth retrying, a broken modpack file stays broken
+						owned = self.job_queue.fail(job, retry=result.skip_reason == SkipReason.DOWNLOAD_ERROR)
+					if not owned:
+						self.logger.warning(f"Lost the lease of the job for <{job.file_name}> to another worker")
+
+				self.logger.info(f"Job queue progress: {self.job_queue.progress()}")
+				yield resolved
+		finally:
+			stop_lease_renewal.set()
+			if executor:
+				executor.shutdown(cancel_futures=True)
+			# give unfinished jobs back to the queue on errors or interrupts
+			self.job_queue.release()
+
+	def pop_file_records(self, files: List[FileIdentifier]) -> Dict[FileIdentifier, dict]:
+		return self.file_records.pop_many(files)
+
+	def _update_watermark(self, plan: DependantPlan):
+		if plan.max_file_id is None:
+			return
+		max_file_id, date_modified = plan.max_file_id, plan.dependant['dateModified']
+		if plan.min_zero_downloads_file_id is not None:
+			# files with 0 downloads aren't retried, thus the next run has to list them again until they are downloaded
+			max_file_id, date_modified = min(max_file_id, plan.min_zero_downloads_file_id - 1), None
+		self.db['dependent_watermark'].upsert(dict(
+			project_id=plan.dependant['id'], date_modified=date_modified,
+			max_file_id=max_file_id, timestamp=int(time.time())
+		), ['project_id'])
+
+	def _get_stored_files(self, project_id: int) -> List[FileIdentifier]:
+		"""
+		:return: the files of the project whose dependencies are stored
+		"""
+		return [FileIdentifier(project_id, row['file_id']) for row in self.db['file'].find(project_id=project_id, order_by='file_id')]
 
-	def _resolve_project_dependencies(self, dependant: dict) -> List[FileIdentifier]:
+	def _list_project_files(self, dependant: dict) -> Tuple[List[dict], List[FileIdentifier], Optional[int]]:
+		"""
+		Lists the files of the dependant, files that are older than the watermark of the dependant are served from the db
+		:return: the listed files, the files served from the db and the highest file id
+		:raises requests.RequestException:
+		"""
+		watermark = self.db['dependent_watermark'].find_one(project_id=dependant['id']) if self.use_watermarks else None
+		if not watermark:
+			# a watermark must not be taken from a cached listing, the cached pages may miss files that the next run wouldn't list again
+			files = self.apiHelper.cf_api.get_all_project_files(dependant['id'], use_cache=not self.use_watermarks)
+			return files, [], max((file['id'] for file in files), default=None)
+
+		stored_files = self._get_stored_files(dependant['id'])
+		if watermark['date_modified'] == dependant['dateModified']:
+			self.logger.debug(f"Dependant <{dependant['name']}> didn't change since the last run")
+			return [], stored_files, watermark['max_file_id']
+
+		files = {file['id']: file for file in self.apiHelper.cf_api.iter_project_files_newer_than(dependant['id'], watermark['max_file_id'], use_cache=False)}
+		for file in dependant.get('latestFiles', []):  # in case the api doesn't list the newest files first
+			if file['id'] > watermark['max_file_id']:
+				files.setdefault(file['id'], file)
+
+		new_files = list(files.values())
+		return new_files, stored_files, max((file['id'] for file in new_files), default=watermark['max_file_id'])
+
+	def _plan_project_dependencies(self, dependant: dict) -> DependantPlan:
 		self.logger.info(f'Checking dependant <{dependant["name"]}>...')
+		plan = DependantPlan(dependant)
 
 		distribution_is_restricted = not dependant["allowModDistribution"]
 		if distribution_is_restricted and not self.bypass_distribution_restriction:
 			self.logger.error(f"Skipping project <{dependant['name']}> because 'allowModDistribution' is set to False")
-			return []
+			return plan
 
 		if self.skip_zero_downloads and dependant['downloadCount'] == 0:
 			self.logger.warning(f"Skipping project <{dependant['name']}> with 0 downloads -> 'skip_zero_downloads' is set to True")
-			return []
+			return plan
 
 		try:
-			files = self.apiHelper.cf_api.get_all_project_files(dependant['id'])
+			files, stored_files, plan.max_file_id = self._list_project_files(dependant)
 		except requests.RequestException as error:
 			self.logger.error(f"Failed to query project files for id <{dependant['id']}> -> CFCore API: {error}")
-			return []
+			return plan
 
-		self.logger.info(f'found {len(files)} files')
-		resolved_dependencies = []
+		self.logger.info(f'found {len(files)} new files and {len(stored_files)} stored files')
+		self.file_records.put_many(files)
+		plan.files.extend((file, True) for file in stored_files)
+		stored_files = set(stored_files)
 
 		self.logger.info("Checking if all dependencies are resolved...")
+		states = self.get_files_resolution_state([FileIdentifier(file['modId'], file['id']) for file in files])
 		for file in files:
 			file_identifier = FileIdentifier(file['modId'], file['id'])
+			if file_identifier in stored_files:
+				continue
 
-			if self._are_file_dependencies_resolved(file_identifier):
-				resolved_dependencies.append(file_identifier)
+			if states[file_identifier].is_resolved:
+				plan.files.append((file_identifier, True))
 				self.logger.debug(f"Skipping file <{file['fileName']}> -> dependencies already resolved")
 				continue
 
 			download_url = file['downloadUrl']
-			if distribution_is_restricted and self.bypass_distribution_restriction:
-				fid = str(file['id'])
-				f = furl(self.apiHelper.cf_api.edge_cdn_url)
-				f.path.segments = ['files', fid[0:4], fid[4:], file['fileName']]
-				download_url = f.url
+			if not download_url or (distribution_is_restricted and self.bypass_distribution_restriction):
+				download_url = self.apiHelper.cf_api.get_edge_cdn_url(file['id'], file['fileName'])
 
 			if self.skip_zero_downloads and file['downloadCount'] == 0:
-				self.db['skipped_file'].upsert(dict(
-					project_id=file_identifier.project_id, file_id=file_identifier.file_id,
-					reason=SkipReason.ZERO_DOWNLOADS.value, timestamp=int(time.time()), url=download_url
-				), ['project_id', 'file_id'])
+				self._skip_file(file_identifier, SkipReason.ZERO_DOWNLOADS, download_url, file['fileName'])
 				self.logger.warning(f"Skipping file <{file['fileName']}> with 0 downloads -> 'skip_zero_downloads' is set to True")
+				plan.min_zero_downloads_file_id = min(file['id'], plan.min_zero_downloads_file_id or file['id'])
 				continue
 
-			if not self._resolve_file_dependencies(file_identifier, file['fileName'], download_url):
-				self.logger.error(f"Failed to properly resolve dependencies for <{file['fileName']}>")
-				continue
+			plan.files.append((file_identifier, False))
+			plan.jobs.append(ManifestJob(file_identifier, file['fileName'], download_url))
 
-			resolved_dependencies.append(file_identifier)
+		return plan
 
-		return resolved_dependencies
+	def _skip_file(self, file: FileIdentifier, reason: SkipReason, file_url: str, file_name: str = None):
+		"""
+		Records the failed attempt and schedules the next retry with backoff,
+		files skipped for a permanent reason are given up on after `skip_retry_policy.max_retries` attempts
+		"""
+		row = self.db['skipped_file'].find_one(project_id=file.project_id, file_id=file.file_id)
+		attempts = (row['attempts'] or 0) + 1 if row else 1
+		now = int(time.time())
+		if reason in self.permanent_skip_reasons and attempts > self.skip_retry_policy.max_retries:
+			next_attempt = None
+		else:
+			next_attempt = now + int(self.skip_retry_policy.get_delay(attempts - 1))
+
+		self.db['skipped_file'].upsert(dict(
+			project_id=file.project_id, file_id=file.file_id,
+			reason=reason.value, timestamp=now, url=file_url,
+			file_name=file_name if file_name else unquote(file_url.split("/")[-1]),
+			attempts=attempts, next_attempt=next_attempt
+		), ['project_id', 'file_id'])
 
 	def remove_skipped_file(self, project_id: int, file_id: int):
 		self.db['skipped_file'].delete(project_id=project_id, file_id=file_id)
 
 	def resolve_skipped_file_dependencies(self, reason: SkipReason, timestamp: int = None):
+		"""
+		Retries all files that were skipped for the reason, regardless of their retry schedule
+		"""
 		if timestamp:
-			results = self.db['skipped_file'].find(reason=reason.value, timestamp=timestamp)
-			count = self.db['skipped_file'].count(reason=reason.value, timestamp=timestamp)
+			results = list(self.db['skipped_file'].find(reason=reason.value, timestamp=timestamp))
 		else:
-			results = self.db['skipped_file'].find(reason=reason.value)
-			count = self.db['skipped_file'].count(reason=reason.value)
+			results = list(self.db['skipped_file'].find(reason=reason.value))
 
 		if results:
-			self.logger.info(f"Attempting to resolve the dependencies of {count} files. This may take a while...")
-			resolved = 0
-			for skipped_file in results:
-				fid = FileIdentifier(skipped_file['project_id'], skipped_file['file_id'])
-				url = skipped_file['url']
-				file_name = url.split("/")[-1]
-				if not self._resolve_file_dependencies(fid, file_name, url):
-					self.logger.error(f"Failed to properly resolve dependencies for <{file_name}>")
-				else:
-					self.db['skipped_file'].delete(project_id=fid.project_id, file_id=fid.file_id)
-					resolved += 1
-			self.logger.info(f"Resolved {resolved} of {count} files ({resolved / count * 100}%)")
+			self._retry_skipped_files(results)
 		else:
 			self.logger.info("No skipped files found.")
 
-	def _resolve_file_dependencies(self, file: FileIdentifier, file_name: str, file_url: str, delete_temp_file=True) -> bool:
-		success: bool = False
+	def retry_skipped_files(self, reasons: List[SkipReason] = None, limit: int = None) -> Tuple[int, int]:
+		"""
+		Retries the skipped files whose next attempt is due, files that were given up on are ignored
+		:param reasons: only retry files skipped for these reasons, defaults to `retryable_skip_reasons`
+		:param limit: max number of files to retry
+		:return: number of resolved files and number of retried files
+		"""
+		reasons = reasons if reasons else self.retryable_skip_reasons
+		results = list(self.db['skipped_file'].find(
+			reason=[reason.value for reason in reasons], next_attempt={'<=': int(time.time())},
+			order_by='next_attempt', _limit=limit
+		))
+		if len(results) == 0:
+			self.logger.info("No skipped files are due for a retry.")
+			return 0, 0
+		return self._retry_skipped_files(results), len(results)
+
+	def _retry_skipped_files(self, skipped_files: List[dict]) -> int:
+		"""
+		Downloads the manifests of the skipped files concurrently, all db writes happen on the calling thread
+		:return: number of resolved files
+		"""
+		count = len(skipped_files)
+		self.logger.info(f"Attempting to resolve the dependencies of {count} files. This may take a while...")
+		jobs = [ManifestJob(
+			FileIdentifier(row['project_id'], row['file_id']), row['file_name'] if row.get('file_name') else unquote(row['url'].split("/")[-1]), row['url']
+		) for row in skipped_files]
+
+		resolved = 0
+		executor = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+		try:
+			results = executor.map(self._fetch_manifest, jobs) if executor else map(self._fetch_manifest, jobs)
+			for job, result in zip(jobs, results):
+				# a failed attempt reschedules the file with a longer delay
+				if self._store_manifest_result(job, result):
+					self.remove_skipped_file(job.file.project_id, job.file.file_id)
+					resolved += 1
+		finally:
+			if executor:
+				executor.shutdown(cancel_futures=True)
 
-		if self._download_modpack_manifest(file, file_name, file_url):
-			if self._parse_manifest_file(file):
-				success = True
-			else:
-				self.db['skipped_file'].upsert(dict(
-					project_id=file.project_id, file_id=file.file_id,
-					reason=SkipReason.FILE_PARSING_ERROR.value, timestamp=int(time.time()), url=file_url
-				), ['project_id', 'file_id'])
-				success = False
+		self.logger.info(f"Resolved {resolved} of {count} files ({resolved / count * 100}%)")
+		return resolved
 
-		if delete_temp_file:
-			folder_path = f"{self.tempFolderPath}/{file.project_id}_{file.file_id}"
-			if os.path.exists(folder_path):
-				os.remove(f"{folder_path}/manifest.json")
-				os.rmdir(folder_path)
+	def _resolve_file_dependencies(self, file: FileIdentifier, file_name: str, file_url: str, delete_temp_file=True) -> bool:
+		job = ManifestJob(file, file_name, file_url)
+		return self._store_manifest_result(job, self._fetch_manifest(job, delete_temp_file))
 
-		return success
+	def _store_manifest_result(self, job: ManifestJob, result: ManifestResult) -> bool:
+		"""
+		Writes the dependencies of a downloaded manifest or the reason why it was skipped to the db
+		:return: True if the dependencies of the file are resolved
+		"""
+		if result.data is None:
+			if result.skip_reason is not None:
+				self._skip_file(job.file, result.skip_reason, job.file_url, job.file_name)
+		elif self._parse_manifest_data(result.data, job.file):
+			return True
+		else:
+			self._skip_file(job.file, SkipReason.FILE_PARSING_ERROR, job.file_url, job.file_name)
 
-	@staticmethod
-	def _resolve_cdn_url(url: str) -> str:
-		try:
-			response = requests.head(url, allow_redirects=True)
-			response.raise_for_status()
-			return response.url
-		except requests.RequestException as error:
-			raise GetRedirectedUrlError(f"Failed to get resultant url for <{url}> -> {error}")
+		self.logger.error(f"Failed to properly resolve dependencies for <{job.file_name}>")
+		return False
 
-	def _download_modpack_manifest(self, file: FileIdentifier, file_name: str, file_url: str) -> bool:
+	def _fetch_manifest(self, job: ManifestJob, delete_temp_file=True) -> ManifestResult:
+		"""
+		Downloads and reads the manifest of the modpack file, doesn't access the db and thus is safe to call from worker threads
+		"""
+		if self.manifest_archive is not None:
+			buffer = self.manifest_archive.get(job.file)
+			if buffer is not None:
+				self.logger.debug(f"Reading manifest for <{job.file_name}> from the archive")
+				return ManifestResult(data=self._parse_manifest_buffer(job.file, buffer), skip_reason=SkipReason.FILE_PARSING_ERROR)
+
+		result = self._fetch_manifest_from_cdn(job, delete_temp_file)
+		if result.data is None and result.skip_reason == SkipReason.DOWNLOAD_ERROR and self.cdn_url_resolver.invalidate(job.file_url):
+			self.logger.debug(f"Retrying download of manifest for <{job.file_name}> with redirect lookup")
+			result = self._fetch_manifest_from_cdn(job, delete_temp_file)
+		return result
+
+	def _fetch_manifest_from_cdn(self, job: ManifestJob, delete_temp_file=True) -> ManifestResult:
 		try:
-			# we need to get the resultant url from url redirection ourselves because RemoteZip doesn't work with url redirections
-			redirected_url = self._resolve_cdn_url(file_url)
+			# resolve the url redirection once instead of following it with every range request
+			redirected_url = self.cdn_url_resolver.resolve(job.file_url)
 		except GetRedirectedUrlError as error:
-			self.db['skipped_file'].upsert(dict(
-				project_id=file.project_id, file_id=file.file_id,
-				reason=SkipReason.DOWNLOAD_ERROR.value, timestamp=int(time.time()), url=file_url
-			), ['project_id', 'file_id'])
-			self.logger.error(f"Failed to download manifest for <{file_name}> -> {error}")
-			return False
-
-		os.makedirs(self.tempFolderPath, exist_ok=True)
-		temp_folder = f"{self.tempFolderPath}/{file.project_id}_{file.file_id}"
-
-		start_time = time.perf_counter()
+			self.logger.error(f"Failed to download manifest for <{job.file_name}> -> {error}")
+			return ManifestResult(skip_reason=SkipReason.DOWNLOAD_ERROR)
+
+		if self.in_memory_manifest:
+			output = io.BytesIO()
+			failure = self._read_manifest_into(job, redirected_url, output)
+			if failure is not None:
+				return failure
+			buffer = output.getvalue()
+			if self.manifest_archive is not None:
+				self.manifest_archive.put(job.file, buffer)
+			return ManifestResult(data=self._parse_manifest_buffer(job.file, buffer), skip_reason=SkipReason.FILE_PARSING_ERROR)
+
+		temp_folder = f"{self.tempFolderPath}/{job.file.project_id}_{job.file.file_id}"
+		file_path = f"{temp_folder}/manifest.json"
 		try:
-			with RemoteZip(url=redirected_url) as remote:
-				remote.extract('manifest.json', path=temp_folder)
-				self.logger.debug(f"Downloading manifest for <{file_name}> took {time.perf_counter() - start_time} seconds")
-				return True
-		except RemoteIOError as error:
-			self.db['skipped_file'].upsert(dict(
-				project_id=file.project_id, file_id=file.file_id,
-				reason=SkipReason.DOWNLOAD_ERROR.value, timestamp=int(time.time()), url=file_url
-			), ['project_id', 'file_id'])
-			self.logger.error(f"Failed to download manifest for <{file_name}> -> {error}")
-		except IOError as error:
-			self.logger.error(f"Failed to save <{temp_folder}//manifest.json> -> {error}")
-
-		return False
+			try:
+				os.makedirs(temp_folder, exist_ok=True)
+				with open(file_path, 'wb') as f:
+					# the manifest is streamed into the file, it is never held in memory as a whole
+					failure = self._read_manifest_into(job, redirected_url, f)
+			except IOError as error:
+				self.logger.error(f"Failed to save <{file_path}> -> {error}")
+				return ManifestResult()
+			if failure is not None:
+				return failure
+
+			if self.manifest_archive is not None:
+				with open(file_path, 'rb') as f:
+					self.manifest_archive.put(job.file, f.read())
+			return ManifestResult(data=self._read_manifest_file(job.file), skip_reason=SkipReason.FILE_PARSING_ERROR)
+		finally:
+			if delete_temp_file and os.path.exists(temp_folder):
+				if os.path.exists(file_path):
+					os.remove(file_path)
+				os.rmdir(temp_folder)
+
+	def _read_manifest_into(self, job: ManifestJob, redirected_url: str, output: BinaryIO) -> Optional[ManifestResult]:
+		"""
+		Streams the manifest of the modpack file into the file object
+		:return: the result of the failed read, None if the manifest was read
+		"""
+		try:
+			stats = self.manifest_reader.read_into(redirected_url, output, 'manifest.json')
+			self.logger.debug(f"Downloading manifest for <{job.file_name}> took {stats}")
+		except ZipRangeReadError as error:
+			self.logger.error(f"Failed to download manifest for <{job.file_name}> -> {error}")
+			return ManifestResult(skip_reason=SkipReason.DOWNLOAD_ERROR)
+		except KeyError:
+			self.logger.error("Missing manifest.json")
+			return ManifestResult(skip_reason=SkipReason.FILE_PARSING_ERROR)
+		except ZipManifestParseError as error:
+			self.logger.error(f"Failed to read manifest for <{job.file_name}> -> {error}")
+			return ManifestResult(skip_reason=SkipReason.FILE_PARSING_ERROR)
+		return None
 
 	def _download_modpack(self, file: FileIdentifier, file_name: str, file_url: str, max_file_length: float) -> bool:
 		try:
-			response = requests.head(file_url, allow_redirects=True)
+			response = self.apiHelper.http.head(file_url, allow_redirects=True)
 			response.raise_for_status()
 			header = response.headers
 			content_length = header.get('content-length', None)
 			if content_length and int(content_length) > max_file_length:
-				self.db['skipped_file'].upsert(dict(
-					project_id=file.project_id, file_id=file.file_id,
-					reason=SkipReason.DOWNLOAD_TOO_LARGE.value, timestamp=int(time.time()), url=file_url
-				), ['project_id', 'file_id'])
+				self._skip_file(file, SkipReason.DOWNLOAD_TOO_LARGE, file_url)
 				self.logger.error(f"Skipping download of file <{file_name}> -> File length of {int(content_length) / 1e6} MB is larger than {max_file_length / 1e6} MB")
 				return False
 		except requests.RequestException as error:
@@ -345,17 +1463,14 @@ class DependencyResolver(DependencyResolverInterface):
 
 		start_time = time.perf_counter()
 		try:
-			response = requests.get(file_url, allow_redirects=True)
+			response = self.apiHelper.http.get(file_url, allow_redirects=True)
 			response.raise_for_status()
 			with open(file_path, 'wb') as f:
 				f.write(response.content)
 				self.logger.debug(f"Downloading file <{file_name}> took {time.perf_counter() - start_time} seconds")
 				return True
 		except requests.RequestException as error:
-			self.db['skipped_file'].upsert(dict(
-				project_id=file.project_id, file_id=file.file_id,
-				reason=SkipReason.DOWNLOAD_ERROR.value, timestamp=int(time.time()), url=file_url
-			), ['project_id', 'file_id'])
+			self._skip_file(file, SkipReason.DOWNLOAD_ERROR, file_url)
 			self.logger.error(f"Failed to download file <{file_name}> -> {error}")
 		except IOError as error:
 			self.logger.error(f"Failed to save file <{file_name}> as <{file_path}> -> {error}")
@@ -378,30 +1493,74 @@ class DependencyResolver(DependencyResolverInterface):
 		with zip_file.open('manifest.json') as f:
 			return self._parse_manifest_data(json.load(f), file)
 
-	def _parse_manifest_file(self, file: FileIdentifier) -> bool:
+	def rebuild_from_archive(self, project_id: int = None) -> int:
+		"""
+		Stores the dependencies of all archived manifests without accessing the network, e.g. to rebuild the db or after changing the parsing
+		:param project_id: only rebuild the files of this project
+		:return: number of files whose dependencies were stored
+		"""
+		if self.manifest_archive is None:
+			raise ValueError("'manifest_archive' isn't configured")
+
+		count = 0
+		with self.db:  # one transaction for all files
+			for file, buffer in self.manifest_archive.iter_manifests(project_id):
+				data = self._parse_manifest_buffer(file, buffer)
+				if data is not None and self._parse_manifest_data(data, file):
+					count += 1
+				else:
+					self.logger.error(f"Failed to rebuild dependencies of file <{file.file_id}> from the archive")
+		self.logger.info(f"Rebuilt the dependencies of {count} files from the manifest archive")
+		return count
+
+	def _parse_manifest_buffer(self, file: FileIdentifier, buffer: bytes) -> Optional[dict]:
+		try:
+			return json.loads(buffer)
+		except ValueError as error:
+			self.logger.error(f"Failed to parse manifest of file <{file.file_id}> -> {error}")
+			return None
+
+	def _read_manifest_file(self, file: FileIdentifier) -> Optional[dict]:
 		file_path = f"{self.tempFolderPath}/{file.project_id}_{file.file_id}/manifest.json"
 
 		if not os.path.exists(file_path):
 			self.logger.error("Missing manifest.json")
-			return False
+			return None
 
-		with open(file_path) as f:
-			return self._parse_manifest_data(json.load(f), file)
+		try:
+			with open(file_path) as f:
+				return json.load(f)
+		except ValueError as error:
+			self.logger.error(f"Failed to parse <{file_path}> -> {error}")
+			return None
 
 	def _parse_manifest_data(self, data, file: FileIdentifier) -> bool:
 		if "files" not in data:
 			return False
 
 		projects = data["files"]
-
-		self.db['file'].upsert(dict(
-			project_id=file.project_id, file_id=file.file_id, dependency_count=len(projects)
-		), ['project_id', 'file_id'])
-
-		for project in projects:
-			self.db['dependency'].insert_ignore(dict(
-				project_id=file.project_id, file_id=file.file_id,
-				dependency_project_id=project["projectID"], dependency_file_id=project["fileID"]
-			), ['project_id', 'file_id', 'dependency_project_id', 'dependency_file_id'])
+		rows = [dict(
+			project_id=file.project_id, file_id=file.file_id,
+			dependency_project_id=project["projectID"], dependency_file_id=project["fileID"]
+		) for project in projects]
+
+		with self.db:
+			if self.compact_storage:
+				dependencies = frozenset((row['dependency_project_id'], row['dependency_file_id']) for row in rows)
+				set_id = self.dependency_sets.store(file.project_id, dependencies)
+				self.db['file'].upsert(dict(
+					project_id=file.project_id, file_id=file.file_id, dependency_count=len(projects), dependency_set_id=set_id
+				), ['project_id', 'file_id'])
+			else:
+				self.db['file'].upsert(dict(
+					project_id=file.project_id, file_id=file.file_id, dependency_count=len(projects)
+				), ['project_id', 'file_id'])
+				self._insert_ignore_many(self.db['dependency'], rows)
 
 		return True
+
+	def _insert_ignore_many(self, table: Table, rows: List[dict]):
+		"""Inserts all rows with one multi-row statement, rows that violate a unique constraint are skipped"""
+		if len(rows) == 0:
+			return
+		self.db.executable.execute(_insert_ignore_statement(self.db, table), rows)
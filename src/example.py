@@ -6,8 +6,10 @@ import requests
 from dataset import Table
 
 import mod_data_collector
-from dependency_resolver import DependencyResolver, SkipReason
-from save_handlers import DatasetSaveHandler
+from dependency_resolver import DependencyResolver
+from job_queue import JobQueue
+from manifest_archive import ManifestArchive
+from save_handlers import DatasetSaveHandler, Sqlite3SaveHandler
 from web_apis import ApiHelper
 
 
@@ -43,8 +45,41 @@ def main(cf_core_api_key: str, mod_id: int, force: bool = False):
 def resolve_skipped_dependencies(cf_core_api_key: str):
 	logger = create_logger()
 	api_helper = ApiHelper(cf_core_api_key)
-	with DependencyResolver(api_helper, logger.getChild("DependencyResolver")) as dependency_resolver:
-		dependency_resolver.resolve_skipped_file_dependencies(SkipReason.DOWNLOAD_TOO_LARGE)
+	with DependencyResolver(api_helper, logger.getChild("DependencyResolver"), max_workers=8) as dependency_resolver:
+		# retries the skipped files whose next attempt is due
+		dependency_resolver.retry_skipped_files()
+
+
+def work_job_queue(cf_core_api_key: str):
+	"""
+	Run this in additional processes to help resolving the manifests of a collection that uses the same job queue
+	"""
+	logger = create_logger()
+	api_helper = ApiHelper(cf_core_api_key)
+	job_queue = JobQueue("jobs.db")  # use journal_mode="DELETE" if the workers run on several hosts that share the file
+	with DependencyResolver(api_helper, logger.getChild("DependencyResolver"), job_queue=job_queue, max_workers=8) as dependency_resolver:
+		dependency_resolver.work_queue(wait=True)
+	job_queue.close()
+
+
+def rebuild_dependencies_from_archive(cf_core_api_key: str):
+	"""
+	Rebuilds the dependencies db offline from the manifests that were archived by previous runs
+	"""
+	logger = create_logger()
+	api_helper = ApiHelper(cf_core_api_key)
+	with ManifestArchive("manifest_archive") as manifest_archive:
+		with DependencyResolver(api_helper, logger.getChild("DependencyResolver"), db_url="sqlite:///dependencies_rebuilt.db", manifest_archive=manifest_archive) as dependency_resolver:
+			dependency_resolver.rebuild_from_archive()
+
+
+def migrate_dataset_db(dataset_db_path: str, sqlite_db_path: str):
+	"""
+	Imports a database that was created by the DatasetSaveHandler into a database of the Sqlite3SaveHandler
+	"""
+	with Sqlite3SaveHandler(sqlite_db_path, int(time.time())) as save_handler:
+		for table, count in save_handler.import_dataset_db(dataset_db_path).items():
+			print("Table:", table, "Rows:", count)
 
 
 def resolve_dependency_relations(cf_core_api_key: str, mod_id: int):
@@ -0,0 +1,238 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from enum import IntEnum
+from typing import List, Dict, Set
+
+from dependency_resolver import FileIdentifier, ManifestJob
+
+
+class JobStatus(IntEnum):
+	PENDING = 0
+	LEASED = 1
+	DONE = 2
+	FAILED = 3
+
+
+class JobQueue:
+	"""
+	Durable sqlite-backed queue of manifest jobs, can be shared by several worker processes.
+
+	A worker claims a batch of jobs by leasing them for `lease_timeout` seconds.
+	Jobs whose lease expired, because their worker crashed or was killed, can be claimed again by any worker.
+	A job is retried until it is done or failed `max_attempts` times, thus a restarted run picks up where the last one stopped.
+	The database file must be on a filesystem with working file locks (e.g. not on most NFS mounts).
+	The default WAL journal needs shared memory and thus only works for workers on the same host,
+	workers on several hosts that share the database file must use a rollback journal (journal_mode "DELETE" or "TRUNCATE").
+	"""
+
+	def __init__(self, db_path: str = "jobs.db", lease_timeout: float = 300, max_attempts: int = 3, worker_id: str = None, journal_mode: str = "WAL"):
+		"""
+		:param db_path: path of the sqlite database file
+		:param lease_timeout: seconds after which a claimed job that isn't finished can be claimed by other workers
+		:param max_attempts: max number of times a job is claimed before it is marked as failed
+		:param worker_id: unique name of this worker, defaults to host name and process id
+		:param journal_mode: sqlite journal mode, "WAL" for workers on one host, "DELETE" or "TRUNCATE" for workers on several hosts
+		"""
+		if journal_mode.upper() not in ("WAL", "DELETE", "TRUNCATE", "PERSIST"):
+			raise ValueError(f"Unsupported journal mode: {journal_mode}")
+		self.lease_timeout = lease_timeout
+		self.max_attempts = max_attempts
+		self.worker_id: str = worker_id if worker_id else f"{socket.gethostname()}:{os.getpid()}"
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(db_path, timeout=60, check_same_thread=False, isolation_level=None)
+		self._db.execute(f"PRAGMA journal_mode={journal_mode.upper()}")
+		# NORMAL is only durable enough in WAL mode, a rollback journal needs FULL
+		self._db.execute("PRAGMA synchronous=NORMAL" if journal_mode.upper() == "WAL" else "PRAGMA synchronous=FULL")
+		self._db.execute("""
+			CREATE TABLE IF NOT EXISTS job (
+				project_id INTEGER NOT NULL,
+				file_id INTEGER NOT NULL,
+				file_name TEXT NOT NULL,
+				file_url TEXT NOT NULL,
+				status INTEGER NOT NULL,
+				attempts INTEGER NOT NULL DEFAULT 0,
+				lease_owner TEXT,
+				lease_expires_at REAL,
+				created_at REAL NOT NULL,
+				updated_at REAL NOT NULL,
+				PRIMARY KEY (project_id, file_id)
+			)
+		""")
+		self._db.execute("CREATE INDEX IF NOT EXISTS job_status ON job (status, lease_expires_at)")
+
+	def close(self):
+		with self._lock:
+			self._db.close()
+
+	def put_many(self, jobs: List[ManifestJob]) -> int:
+		"""
+		Adds the jobs to the queue, jobs that are already queued or leased are kept as they are,
+		finished jobs are queued again with a reset attempt count
+		:return: number of jobs in the queue after the call that weren't finished before
+		"""
+		if len(jobs) == 0:
+			return 0
+
+		now = time.time()
+		with self._lock:
+			self._db.execute("BEGIN IMMEDIATE")
+			try:
+				cursor = self._db.executemany(f"""
+					INSERT INTO job (project_id, file_id, file_name, file_url, status, attempts, created_at, updated_at) VALUES (?, ?, ?, ?, {JobStatus.PENDING}, 0, ?, ?)
+					ON CONFLICT (project_id, file_id) DO UPDATE SET
+						status = {JobStatus.PENDING}, attempts = 0, file_name = excluded.file_name, file_url = excluded.file_url,
+						lease_owner = NULL, lease_expires_at = NULL, updated_at = excluded.updated_at
+					WHERE status IN ({JobStatus.DONE}, {JobStatus.FAILED})
+				""", [(job.file.project_id, job.file.file_id, job.file_name, job.file_url, now, now) for job in jobs])
+				self._db.execute("COMMIT")
+			except BaseException:
+				self._db.execute("ROLLBACK")
+				raise
+		return cursor.rowcount
+
+	def claim(self, count: int = 1) -> List[ManifestJob]:
+		"""
+		Leases up to `count` pending jobs or jobs whose lease expired to this worker
+		"""
+		now = time.time()
+		with self._lock:
+			# BEGIN IMMEDIATE takes the write lock upfront, thus two workers can't claim the same job
+			self._db.execute("BEGIN IMMEDIATE")
+			try:
+				self._db.execute(f"""
+					UPDATE job SET status = {JobStatus.FAILED}, lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+						WHERE status = {JobStatus.LEASED} AND lease_expires_at < ? AND attempts >= ?
+				""", (now, now, self.max_attempts))
+				rows = self._db.execute(f"""
+					SELECT project_id, file_id, file_name, file_url FROM job
+						WHERE status = {JobStatus.PENDING} OR (status = {JobStatus.LEASED} AND lease_expires_at < ?)
+						ORDER BY project_id, file_id
+						LIMIT ?
+				""", (now, count)).fetchall()
+				self._db.executemany(f"""
+					UPDATE job SET status = {JobStatus.LEASED}, attempts = attempts + 1, lease_owner = ?, lease_expires_at = ?, updated_at = ?
+						WHERE project_id = ? AND file_id = ?
+				""", [(self.worker_id, now + self.lease_timeout, now, project_id, file_id) for project_id, file_id, _, _ in rows])
+				self._db.execute("COMMIT")
+			except BaseException:
+				self._db.execute("ROLLBACK")
+				raise
+		return [ManifestJob(FileIdentifier(project_id, file_id), file_name, file_url) for project_id, file_id, file_name, file_url in rows]
+
+	def complete(self, job: ManifestJob) -> bool:
+		"""
+		:return: False if the job isn't leased to this worker anymore, e.g. because its lease expired and another worker claimed it
+		"""
+		with self._lock:
+			cursor = self._db.execute(f"""
+				UPDATE job SET status = {JobStatus.DONE}, lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+					WHERE project_id = ? AND file_id = ? AND status = {JobStatus.LEASED} AND lease_owner = ?
+			""", (time.time(), job.file.project_id, job.file.file_id, self.worker_id))
+		return cursor.rowcount == 1
+
+	def fail(self, job: ManifestJob, retry: bool = True) -> bool:
+		"""
+		:param job:
+		:param retry: queue the job again if it has attempts left, otherwise it is marked as failed right away
+		:return: False if the job isn't leased to this worker anymore
+		"""
+		with self._lock:
+			cursor = self._db.execute(f"""
+				UPDATE job SET status = CASE WHEN ? AND attempts < ? THEN {JobStatus.PENDING} ELSE {JobStatus.FAILED} END,
+					lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+					WHERE project_id = ? AND file_id = ? AND status = {JobStatus.LEASED} AND lease_owner = ?
+			""", (retry, self.max_attempts, time.time(), job.file.project_id, job.file.file_id, self.worker_id))
+		return cursor.rowcount == 1
+
+	def release(self):
+		"""
+		Gives the jobs leased by this worker back to the queue without counting the attempt, e.g. on shutdown
+		"""
+		with self._lock:
+			self._db.execute(f"""
+				UPDATE job SET status = {JobStatus.PENDING}, attempts = MAX(attempts - 1, 0), lease_owner = NULL, lease_expires_at = NULL, updated_at = ?
+					WHERE status = {JobStatus.LEASED} AND lease_owner = ?
+			""", (time.time(), self.worker_id))
+
+	def extend_leases(self):
+		"""
+		Renews the leases of all jobs claimed by this worker
+		"""
+		now = time.time()
+		with self._lock:
+			self._db.execute(
+				f"UPDATE job SET lease_expires_at = ?, updated_at = ? WHERE status = {JobStatus.LEASED} AND lease_owner = ?",
+				(now + self.lease_timeout, now, self.worker_id)
+			)
+
+	def start_lease_renewal(self, interval: float = None) -> threading.Event:
+		"""
+		Renews the leases of this worker from a background thread until the returned event is set,
+		thus long running jobs keep their lease independent of how fast their results are handled
+		:param interval: seconds between renewals, defaults to a third of the lease timeout
+		"""
+		interval = interval if interval is not None else self.lease_timeout / 3
+		stop = threading.Event()
+
+		def run():
+			while not stop.wait(interval):
+				try:
+					self.extend_leases()
+				except sqlite3.OperationalError:
+					pass  # the db is locked by other workers for too long, the next renewal is tried after the interval
+
+		threading.Thread(target=run, name=f"lease-renewal-{self.worker_id}", daemon=True).start()
+		return stop
+
+	def get_unfinished(self, files: List[FileIdentifier]) -> Set[FileIdentifier]:
+		"""
+		:return: the given files whose jobs are pending or leased
+		"""
+		files = set(files)
+		project_ids = list({file.project_id for file in files})
+		unfinished = set()
+		with self._lock:
+			for i in range(0, len(project_ids), 500):
+				chunk = project_ids[i:i + 500]
+				rows = self._db.execute(
+					f"SELECT project_id, file_id FROM job WHERE status IN ({JobStatus.PENDING}, {JobStatus.LEASED}) AND project_id IN ({', '.join('?' * len(chunk))})",
+					chunk
+				).fetchall()
+				unfinished.update(file for file in (FileIdentifier(project_id, file_id) for project_id, file_id in rows) if file in files)
+		return unfinished
+
+	def has_unfinished_jobs(self) -> bool:
+		with self._lock:
+			return self._db.execute(f"SELECT EXISTS (SELECT 1 FROM job WHERE status IN ({JobStatus.PENDING}, {JobStatus.LEASED}))").fetchone()[0] == 1
+
+	def progress(self) -> Dict[str, int]:
+		"""
+		Can be queried by any process while the workers are running
+		:return: number of jobs per status and number of workers that currently hold a lease
+		"""
+		with self._lock:
+			counts = dict(self._db.execute("SELECT status, COUNT(*) FROM job GROUP BY status").fetchall())
+			workers = self._db.execute(
+				f"SELECT COUNT(DISTINCT lease_owner) FROM job WHERE status = {JobStatus.LEASED} AND lease_expires_at >= ?", (time.time(),)
+			).fetchone()[0]
+		progress = {status.name.lower(): counts.get(status.value, 0) for status in JobStatus}
+		progress['workers'] = workers
+		return progress
+
+	def clear_finished(self):
+		"""
+		Removes all done and failed jobs
+		"""
+		with self._lock:
+			self._db.execute(f"DELETE FROM job WHERE status IN ({JobStatus.DONE}, {JobStatus.FAILED})")
+
+
+if __name__ == '__main__':
+	import sys
+
+	queue = JobQueue(sys.argv[1] if len(sys.argv) > 1 else "jobs.db")
+	print(", ".join(f"{key}: {value}" for key, value in queue.progress().items()))
+	queue.close()
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from enum import IntEnum
+from typing import Optional, Iterator, Tuple
+
+from dependency_resolver import FileIdentifier
+
+
+class Codec(IntEnum):
+	ZLIB = 1
+	ZSTD = 2
+
+
+def _get_zstd():
+	try:
+		import zstandard
+		return zstandard
+	except ImportError:
+		return None
+
+
+class ManifestArchive:
+	"""
+	Local content-addressed archive of modpack manifests, can be shared by several processes.
+
+	The compressed manifests are appended to a pack file, the sqlite index maps the content hash to the location in the pack file
+	and every modpack file (project_id, file_id) to the content hash of its manifest. Identical manifests are stored only once.
+	Manifests are compressed with zstd if the `zstandard` package is installed, otherwise with zlib.
+	"""
+
+	def __init__(self, folder_path: str = "manifest_archive", codec: Codec = None, level: int = None):
+		"""
+		:param folder_path: folder of the pack file and the index
+		:param codec: compression of new manifests, defaults to zstd if available, already stored manifests keep their codec
+		:param level: compression level, defaults to 10 for zstd and 9 for zlib
+		"""
+		self._zstd = _get_zstd()
+		self.codec: Codec = codec if codec else (Codec.ZSTD if self._zstd else Codec.ZLIB)
+		if self.codec == Codec.ZSTD and not self._zstd:
+			raise ImportError("zstd compression requires the 'zstandard' package")
+		self.level: int = level if level is not None else (10 if self.codec == Codec.ZSTD else 9)
+		self.hits: int = 0
+		self.misses: int = 0
+
+		os.makedirs(folder_path, exist_ok=True)
+		self.pack_path = os.path.join(folder_path, "manifests.pack")
+		self._lock = threading.Lock()
+		self._pack = open(self.pack_path, 'a+b')
+		self._db = sqlite3.connect(os.path.join(folder_path, "index.db"), timeout=60, check_same_thread=False, isolation_level=None)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute("PRAGMA synchronous=NORMAL")
+		self._db.execute("""
+			CREATE TABLE IF NOT EXISTS blob (
+				hash TEXT PRIMARY KEY,
+				offset INTEGER NOT NULL,
+				length INTEGER NOT NULL,
+				size INTEGER NOT NULL,
+				codec INTEGER NOT NULL
+			)
+		""")
+		self._db.execute("""
+			CREATE TABLE IF NOT EXISTS manifest (
+				project_id INTEGER NOT NULL,
+				file_id INTEGER NOT NULL,
+				hash TEXT NOT NULL,
+				PRIMARY KEY (project_id, file_id)
+			) WITHOUT ROWID
+		""")
+
+	def close(self):
+		with self._lock:
+			self._db.close()
+			self._pack.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def __contains__(self, file: FileIdentifier) -> bool:
+		with self._lock:
+			return self._db.execute("SELECT 1 FROM manifest WHERE project_id = ? AND file_id = ?", (file.project_id, file.file_id)).fetchone() is not None
+
+	def __len__(self) -> int:
+		with self._lock:
+			return self._db.execute("SELECT COUNT(*) FROM manifest").fetchone()[0]
+
+	def _compress(self, buffer: bytes) -> bytes:
+		if self.codec == Codec.ZSTD:
+			return self._zstd.ZstdCompressor(level=self.level).compress(buffer)
+		return zlib.compress(buffer, self.level)
+
+	def _decompress(self, data: bytes, codec: int, size: int) -> bytes:
+		if codec == Codec.ZSTD:
+			if not self._zstd:
+				raise ImportError("The archive contains zstd compressed manifests, which requires the 'zstandard' package")
+			return self._zstd.ZstdDecompressor().decompress(data, max_output_size=size)
+		return zlib.decompress(data)
+
+	def _read_blob(self, offset: int, length: int, codec: int, size: int) -> bytes:
+		if hasattr(os, "pread"):
+			# os.pread doesn't move the shared file position, thus it is safe to call from several threads
+			data = os.pread(self._pack.fileno(), length, offset)
+		else:
+			# os.pread is POSIX only, seek and read share the file position with put and thus need the lock
+			with self._lock:
+				self._pack.seek(offset)
+				data = self._pack.read(length)
+		return self._decompress(data, codec, size)
+
+	def put(self, file: FileIdentifier, buffer: bytes) -> str:
+		"""
+		Stores the manifest of the modpack file, replaces the manifest that was stored for the file before
+		:return: content hash of the manifest
+		"""
+		content_hash = hashlib.sha256(buffer).hexdigest()
+		with self._lock:
+			# the write lock of the index also serializes the appends of concurrent processes to the pack file
+			self._db.execute("BEGIN IMMEDIATE")
+			try:
+				if self._db.execute("SELECT 1 FROM blob WHERE hash = ?", (content_hash,)).fetchone() is None:
+					data = self._compress(buffer)
+					offset = self._pack.seek(0, os.SEEK_END)
+					self._pack.write(data)
+					self._pack.flush()
+					os.fsync(self._pack.fileno())  # a crash must not leave an index entry that points to missing data
+					self._db.execute(
+						"INSERT INTO blob (hash, offset, length, size, codec) VALUES (?, ?, ?, ?, ?)",
+						(content_hash, offset, len(data), len(buffer), self.codec.value)
+					)
+				self._db.execute(
+					"INSERT OR REPLACE INTO manifest (project_id, file_id, hash) VALUES (?, ?, ?)",
+					(file.project_id, file.file_id, content_hash)
+				)
+				self._db.execute("COMMIT")
+			except BaseException:
+				self._db.execute("ROLLBACK")
+				raise
+		return content_hash
+
+	def get(self, file: FileIdentifier) -> Optional[bytes]:
+		"""
+		:return: the stored manifest of the modpack file or None
+		"""
+		with self._lock:
+			row = self._db.execute("""
+				SELECT b.offset, b.length, b.codec, b.size FROM manifest m JOIN blob b ON b.hash = m.hash
+					WHERE m.project_id = ? AND m.file_id = ?
+			""", (file.project_id, file.file_id)).fetchone()
+			if row is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+		return self._read_blob(*row)
+
+	def iter_manifests(self, project_id: int = None) -> Iterator[Tuple[FileIdentifier, bytes]]:
+		"""
+		Iterates over all stored manifests in the order of the pack file, which makes the reads sequential
+		:param project_id: only the manifests of the files of this project
+		"""
+		query = """
+			SELECT m.project_id, m.file_id, b.offset, b.length, b.codec, b.size FROM manifest m JOIN blob b ON b.hash = m.hash
+		"""
+		params = ()
+		if project_id is not None:
+			query += " WHERE m.project_id = ?"
+			params = (project_id,)
+		with self._lock:
+			rows = self._db.execute(query + " ORDER BY b.offset", params).fetchall()
+
+		for project_id, file_id, offset, length, codec, size in rows:
+			yield FileIdentifier(project_id, file_id), self._read_blob(offset, length, codec, size)
+
+	def stats(self) -> dict:
+		with self._lock:
+			manifests = self._db.execute("SELECT COUNT(*) FROM manifest").fetchone()[0]
+			blobs, size, compressed_size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length), 0) FROM blob").fetchone()
+			hits, misses = self.hits, self.misses
+		return dict(hits=hits, misses=misses, manifests=manifests, blobs=blobs, size=size, compressed_size=compressed_size)
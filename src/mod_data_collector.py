@@ -1,6 +1,8 @@
 import logging
+import queue
+import threading
 import time
-from typing import List
+from typing import List, Tuple, Dict
 
 import requests
 
@@ -79,7 +81,14 @@ def collect_data(logger: logging.Logger, save_handler: SaveHandlerInterface, dep
 	:param force: force the script to anyways collect the data even if the download count hasn't changed
 	:return:
 	"""
+	collected = _collect_data(logger, save_handler, dependency_resolver, api_helper, mod_id, force)
+	# buffered writes must reach the db before the caller commits or rolls back,
+	# if the collection raised the rows stay buffered and the caller decides what happens with them
+	save_handler.flush()
+	return collected
 
+
+def _collect_data(logger: logging.Logger, save_handler: SaveHandlerInterface, dependency_resolver: DependencyResolverInterface, api_helper: ApiHelper, mod_id: int, force: bool) -> bool:
 	try:
 		response = api_helper.cf_api.get_project(mod_id)
 		response.raise_for_status()
@@ -88,6 +97,47 @@ def collect_data(logger: logging.Logger, save_handler: SaveHandlerInterface, dep
 		logger.error(f"Failed to query project info for id <{mod_id}> -> CFCore API: {error}")
 		return False
 
+	if not _collect_project_data(logger, save_handler, api_helper, project, force):
+		return False
+
+	if not _collect_data_for_project_dependents(logger, save_handler, dependency_resolver, api_helper, [project]):
+		logger.warning(f"Failed to find dependents for <{project['name']}>")
+
+	return True
+
+
+def collect_data_many(logger: logging.Logger, save_handler: SaveHandlerInterface, dependency_resolver: DependencyResolverInterface, api_helper: ApiHelper, mod_ids: List[int], force=False) -> List[int]:
+	"""
+	Collects the data of several mods, the dependents of all mods are resolved only once
+	:param logger:
+	:param save_handler: save handler for storing the collected mod data
+	:param dependency_resolver:
+	:param api_helper:
+	:param mod_ids: CurseForge mod ids
+	:param force: force the script to anyways collect the data even if the download count hasn't changed
+	:return: ids of the mods whose data was collected
+	"""
+	collected_ids = _collect_data_many(logger, save_handler, dependency_resolver, api_helper, mod_ids, force)
+	save_handler.flush()
+	return collected_ids
+
+
+def _collect_data_many(logger: logging.Logger, save_handler: SaveHandlerInterface, dependency_resolver: DependencyResolverInterface, api_helper: ApiHelper, mod_ids: List[int], force: bool) -> List[int]:
+	result = api_helper.cf_api.get_projects_chunked(mod_ids)
+	for ids, error in result.errors:
+		logger.error(f"Failed to query project info for ids <{ids}> -> CFCore API: {error}")
+
+	projects = [project for project in result.data if _collect_project_data(logger, save_handler, api_helper, project, force)]
+	if len(projects) == 0:
+		return []
+
+	if not _collect_data_for_project_dependents(logger, save_handler, dependency_resolver, api_helper, projects):
+		logger.warning(f"Failed to find dependents for <{', '.join(project['name'] for project in projects)}>")
+
+	return [project['id'] for project in projects]
+
+
+def _collect_project_data(logger: logging.Logger, save_handler: SaveHandlerInterface, api_helper: ApiHelper, project: dict, force: bool) -> bool:
 	if not force and not is_stored_project_outdated(save_handler, project):
 		logger.warning(f"Skipping data collection for project <{project['slug']}> because the project data didn't change")
 		return False
@@ -97,7 +147,7 @@ def collect_data(logger: logging.Logger, save_handler: SaveHandlerInterface, dep
 
 	logger.info("Fetching Project Files Info...")
 	try:
-		files = api_helper.cf_api.get_all_project_files(mod_id)
+		files = api_helper.cf_api.get_all_project_files(project['id'])
 	except requests.RequestException as error:
 		logger.error(f"Failed to query files info for project <{project['slug']}> -> CFCore API: {error}")
 		return False
@@ -108,39 +158,161 @@ def collect_data(logger: logging.Logger, save_handler: SaveHandlerInterface, dep
 		logger.warning("No Project Files Found")
 		return False
 
-	if not _collect_data_for_project_dependents(logger, save_handler, dependency_resolver, api_helper, project['id'], project['name'], project['slug']):
-		logger.warning(f"Failed to find dependents for <{project['name']}>")
-
 	return True
 
 
-def _collect_data_for_project_dependents(logger: logging.Logger, save_handler: SaveHandlerInterface, dependency_resolver: DependencyResolverInterface, api_helper: ApiHelper, project_id: int, project_name: str, project_slug: str) -> bool:
-	dependents, files = dependency_resolver.get_project_dependents(project_id, project_name, project_slug)
+class _PipelineStopped(Exception):
+	pass
 
-	if len(dependents) > 0:
-		logger.info("Storing dependents Info...")
-		for dependant in dependents:
-			store_project_info(save_handler, dependant)
 
-	if len(files) > 0:
-		file_ids = [ufid.file_id for ufid in files]
-		logger.debug(f"Retrieving data for {len(file_ids)} files that depend on project <{project_name}>")
+_PIPELINE_END = object()
+
+
+def _put(output: queue.Queue, item, stop: threading.Event):
+	# blocks while the queue is full, but gives up once the pipeline is stopped
+	while not stop.is_set():
+		try:
+			output.put(item, timeout=0.1)
+			return
+		except queue.Full:
+			pass
+	raise _PipelineStopped()
+
+
+def _iter_queue(source: queue.Queue, stop: threading.Event):
+	while True:
+		try:
+			item = source.get(timeout=0.1)
+		except queue.Empty:
+			if stop.is_set():
+				return
+			continue
+		if item is _PIPELINE_END:
+			return
+		yield item
+
+
+def _start_stage(target, output: queue.Queue, stop: threading.Event, errors: list) -> threading.Thread:
+	def run():
 		try:
-			response = api_helper.cf_api.get_files(file_ids)
-			response.raise_for_status()
-			files = response.json()["data"]
-		except requests.RequestException as error:
-			logger.error(f"Failed to query files by id -> CFCore API: {error}")
-			return False
+			target()
+			_put(output, _PIPELINE_END, stop)
+		except _PipelineStopped:
+			pass
+		except BaseException as error:
+			errors.append(error)
+			stop.set()
+
+	thread = threading.Thread(target=run, daemon=True)
+	thread.start()
+	return thread
+
+
+def _collect_data_for_project_dependents(logger: logging.Logger, save_handler: SaveHandlerInterface, dependency_resolver: DependencyResolverInterface, api_helper: ApiHelper, projects: List[dict], queue_size: int = 16, batch_timeout: float = 1) -> bool:
+	"""
+	Runs as a pipeline, so network and db work overlap and memory stays flat:
+	the calling thread lists the dependents and resolves their manifests with the resolver,
+	a thread looks up the file metadata of the resolved dependents in batches,
+	and in between the calling thread looks up the dependencies of the files and stores the results.
+	The resolver and the save handler are only used from the calling thread, thus they don't share a db connection or cache with other threads.
+	:param queue_size: max number of resolved dependents that wait for their look-up
+	:param batch_timeout: max seconds a resolved dependant waits for its look-up batch to fill up
+	"""
+	stop = threading.Event()
+	errors = []
+	resolved_queue = queue.Queue(maxsize=queue_size)
+	# unbounded, so the look-up never blocks the calling thread, it can't hold more than the dependents that went through the resolved queue
+	looked_up_queue = queue.Queue()
+
+	def look_up_batch(batch: List[Tuple[dict, List[FileIdentifier], Dict[FileIdentifier, dict]]]):
+		# only the files that the resolver didn't list in this run, e.g. of unchanged dependents, have to be queried
+		file_ids = [ufid.file_id for _, files, records in batch for ufid in files if ufid not in records]
+		file_data = [record for _, _, records in batch for record in records.values()]
+		if len(file_ids) > 0:
+			logger.debug(f"Retrieving data for {len(file_ids)} dependant files")
+			result = api_helper.cf_api.get_files_chunked(file_ids)
+			for ids, error in result.errors:
+				logger.error(f"Failed to query {len(ids)} files by id -> CFCore API: {error}")
+			file_data.extend(result.data)
+		looked_up_queue.put(([dependant for dependant, _, _ in batch], file_data))
+
+	def look_up():
+		# batches the resolved dependents, a single request can look up many files
+		# a batch is looked up once it is large enough, once its first dependant waited `batch_timeout` seconds or at the end
+		batch = []
+		file_count = 0
+		deadline = None
+		while not stop.is_set():
+			try:
+				item = resolved_queue.get(timeout=0.1 if deadline is None else min(0.1, max(0.0, deadline - time.monotonic())))
+			except queue.Empty:
+				item = None
+			if item is _PIPELINE_END:
+				break
+			if item is not None:
+				batch.append(item)
+				file_count += len(item[1])
+				deadline = deadline if deadline is not None else time.monotonic() + batch_timeout
+			if len(batch) > 0 and (file_count >= api_helper.cf_api.bulk_chunk_size or time.monotonic() >= deadline):
+				look_up_batch(batch)
+				batch, file_count, deadline = [], 0, None
+		if len(batch) > 0 and not stop.is_set():
+			look_up_batch(batch)
+
+	def store_looked_up(dependents: List[dict], file_data: List[dict]):
+		file_identifiers = [FileIdentifier(file['modId'], file['id']) for file in file_data]
+		dependencies = {}  # file -> its dependencies on the projects
+		for project in projects:
+			states = dependency_resolver.get_files_resolution_state(file_identifiers, project['id'])
+			for file_identifier, state in states.items():
+				if state.dependency:
+					dependencies.setdefault(file_identifier, []).append(state.dependency)
+
+		files_by_dependant = {}
+		for file in file_data:
+			files_by_dependant.setdefault(file['modId'], []).append(file)
+		for dependant in dependents:
+			store_dependant(dependant, files_by_dependant.get(dependant['id'], []), dependencies)
 
+	def store_dependant(dependant: dict, files: List[dict], dependencies: Dict[FileIdentifier, List[FileIdentifier]]):
+		logger.info(f"Storing info of dependant <{dependant['name']}>...")
+		store_project_info(save_handler, dependant)
 		for file in files:
-			logger.debug(f"Checking if the file <{file['fileName']}> depends on the project <{project_name}>")
-			dependency = dependency_resolver.get_file_dependency(FileIdentifier(file['modId'], file['id']), project_id)
-			if dependency:
-				store_file_info(save_handler, file)
+			logger.debug(f"Checking if the file <{file['fileName']}> depends on the projects")
+			file_dependencies = dependencies.get(FileIdentifier(file['modId'], file['id']))
+			if not file_dependencies:
+				if len(projects) == 1:
+					logger.warning(f"Skipping file <{file['fileName']}> -> Unable to determine the files dependencies: File is does not depend on <{projects[0]['slug']}>")
+				continue
+
+			store_file_info(save_handler, file)
+			for dependency in file_dependencies:
 				store_file_dependency(save_handler, file, dependency)
-			else:
-				logger.warning(f"Skipping file <{file['fileName']}> -> Unable to determine the files dependencies: File is does not depend on <{project_slug}>")
 
-		return True
-	return False
+	def store_available():
+		while True:
+			try:
+				item = looked_up_queue.get_nowait()
+			except queue.Empty:
+				return
+			store_looked_up(*item)
+
+	thread = _start_stage(look_up, looked_up_queue, stop, errors)
+	found_dependents = False
+	try:
+		for dependant, files in dependency_resolver.iter_dependents_of_projects(projects):
+			found_dependents = True
+			_put(resolved_queue, (dependant, files, dependency_resolver.pop_file_records(files)), stop)
+			store_available()
+		_put(resolved_queue, _PIPELINE_END, stop)
+		for dependents, file_data in _iter_queue(looked_up_queue, stop):
+			store_looked_up(dependents, file_data)
+	except _PipelineStopped:
+		pass  # the look-up failed, its error is raised below
+	finally:
+		stop.set()
+		thread.join()
+
+	if len(errors) > 0:
+		raise errors[0]
+	return found_dependents
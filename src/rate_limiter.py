@@ -0,0 +1,220 @@
+import email.utils
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+
+class TokenBucket:
+	"""
+	Thread-safe token bucket with an adaptive refill rate.
+	The rate is halved when the host throttles us and slowly recovers to the configured rate on success (AIMD).
+	"""
+
+	def __init__(self, rate: float, burst: int, min_rate: float = None):
+		"""
+		:param rate: max number of requests per second
+		:param burst: max number of requests that can be sent at once
+		:param min_rate: lower bound for the adaptive rate
+		"""
+		self.max_rate: float = rate
+		self.min_rate: float = min_rate if min_rate else rate / 16
+		self.rate: float = rate
+		self.burst: int = burst
+		self._tokens: float = burst
+		self._last_refill: float = time.monotonic()
+		self._blocked_until: float = 0
+		self._lock = threading.Lock()
+
+	def _refill(self, now: float):
+		self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+		self._last_refill = now
+
+	def reserve(self) -> float:
+		"""
+		Takes one token from the bucket
+		:return: seconds the caller has to wait before sending the request
+		"""
+		with self._lock:
+			now = time.monotonic()
+			self._refill(now)
+			self._tokens -= 1  # may go negative, which queues the caller behind the other waiting callers
+			delay = 0 if self._tokens >= 0 else -self._tokens / self.rate
+			return max(delay, self._blocked_until - now)
+
+	def acquire(self):
+		"""Blocks until a request may be sent"""
+		delay = self.reserve()
+		if delay > 0:
+			time.sleep(delay)
+
+	def on_throttled(self, retry_after: float = None):
+		with self._lock:
+			now = time.monotonic()
+			self._refill(now)
+			self.rate = max(self.min_rate, self.rate / 2)
+			if retry_after:
+				self._blocked_until = max(self._blocked_until, now + retry_after)
+
+	def on_success(self):
+		with self._lock:
+			if self.rate < self.max_rate:
+				now = time.monotonic()
+				self._refill(now)
+				self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class RateLimiter:
+	"""
+	Holds one TokenBucket per host.
+	A host without its own config uses the config of its closest configured parent domain or the default config.
+	"""
+
+	default_host_limits: Dict[str, Tuple[float, int]] = {
+		"api.curseforge.com": (10, 20),
+		"forgecdn.net": (20, 40),  # edge.forgecdn.net and the hosts it redirects to
+		"modpackindex.com": (2, 5),
+	}
+
+	def __init__(self, host_limits: Dict[str, Tuple[float, int]] = None, default_limit: Tuple[float, int] = (5, 10)):
+		"""
+		:param host_limits: mapping of host name to (requests per second, burst size), overrides the default limits
+		:param default_limit: (requests per second, burst size) of hosts that aren't configured
+		"""
+		self.host_limits: Dict[str, Tuple[float, int]] = {**self.default_host_limits, **(host_limits if host_limits else {})}
+		self.default_limit = default_limit
+		self._buckets: Dict[str, TokenBucket] = {}
+		self._lock = threading.Lock()
+
+	def _get_limit(self, host: str) -> Tuple[float, int]:
+		domain = host
+		while True:
+			if domain in self.host_limits:
+				return self.host_limits[domain]
+			if "." not in domain:
+				return self.default_limit
+			domain = domain.split(".", 1)[1]
+
+	def get_bucket(self, host: str) -> TokenBucket:
+		bucket = self._buckets.get(host)
+		if bucket is None:
+			with self._lock:
+				bucket = self._buckets.get(host)
+				if bucket is None:
+					rate, burst = self._get_limit(host)
+					bucket = TokenBucket(rate, burst)
+					self._buckets[host] = bucket
+		return bucket
+
+	def reserve(self, host: str) -> float:
+		return self.get_bucket(host).reserve()
+
+	def acquire(self, host: str):
+		self.get_bucket(host).acquire()
+
+	def on_throttled(self, host: str, retry_after: float = None):
+		self.get_bucket(host).on_throttled(retry_after)
+
+	def on_success(self, host: str):
+		self.get_bucket(host).on_success()
+
+
+_shared_rate_limiter: Optional[RateLimiter] = None
+_shared_rate_limiter_lock = threading.Lock()
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+	"""Returns the process-wide rate limiter"""
+	global _shared_rate_limiter
+	with _shared_rate_limiter_lock:
+		if _shared_rate_limiter is None:
+			_shared_rate_limiter = RateLimiter()
+		return _shared_rate_limiter
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+	"""
+	Parses the value of a Retry-After header which is either a delay in seconds or an HTTP date
+	:return: seconds to wait or None if the value is missing or malformed
+	"""
+	if not value:
+		return None
+	try:
+		return max(0.0, float(value))
+	except ValueError:
+		pass
+	try:
+		return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+	except (TypeError, ValueError):
+		return None
+
+
+class RetryPolicy:
+	"""Jittered exponential backoff for throttled (429), unavailable (5xx) and failed requests"""
+
+	retry_status_codes = frozenset({429, 500, 502, 503, 504})
+	throttle_status_codes = frozenset({429, 503})
+
+	def __init__(self, max_retries: int = 5, backoff_base: float = 0.5, backoff_max: float = 60):
+		"""
+		:param max_retries: max number of retries per request
+		:param backoff_base: delay in seconds before the first retry, doubles with every retry
+		:param backoff_max: upper bound of the delay in seconds
+		"""
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+
+	def get_delay(self, attempt: int, retry_after: float = None) -> float:
+		"""
+		:param attempt: number of the failed attempt, starting at 0
+		:param retry_after: delay requested by the server
+		"""
+		if retry_after is not None:
+			return min(retry_after, self.backoff_max)
+		backoff = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+		return random.uniform(backoff / 2, backoff)  # "equal jitter", prevents retry storms of concurrent workers
+
+
+class RateLimitedAdapter(HTTPAdapter):
+	"""
+	HTTPAdapter that waits for the rate limiter of the host before sending a request
+	and retries throttled or failed requests with backoff.
+	"""
+
+	def __init__(self, rate_limiter: RateLimiter = None, retry_policy: RetryPolicy = None, **kwargs):
+		super().__init__(**kwargs)
+		self.rate_limiter: RateLimiter = rate_limiter if rate_limiter else get_shared_rate_limiter()
+		self.retry_policy: RetryPolicy = retry_policy if retry_policy else RetryPolicy()
+
+	def send(self, request: requests.PreparedRequest, **kwargs) -> Response:
+		host = requests.utils.urlparse(request.url).hostname
+		attempt = 0
+		while True:
+			self.rate_limiter.acquire(host)
+			try:
+				response = super().send(request, **kwargs)
+			except (requests.ConnectionError, requests.Timeout):
+				if attempt >= self.retry_policy.max_retries:
+					raise
+				time.sleep(self.retry_policy.get_delay(attempt))
+				attempt += 1
+				continue
+
+			if response.status_code not in self.retry_policy.retry_status_codes:
+				self.rate_limiter.on_success(host)
+				return response
+
+			if attempt >= self.retry_policy.max_retries:
+				return response
+
+			retry_after = parse_retry_after(response.headers.get('Retry-After'))
+			if response.status_code in self.retry_policy.throttle_status_codes:
+				self.rate_limiter.on_throttled(host, retry_after)
+			response.close()
+			time.sleep(self.retry_policy.get_delay(attempt, retry_after))
+			attempt += 1
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple, Callable
+
+import requests
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+
+class CachedEntry:
+	def __init__(self, row: tuple):
+		self.key: str = row[0]
+		self.url: str = row[1]
+		self.headers: dict = json.loads(row[2])
+		self.body: bytes = row[3]
+		self.etag: Optional[str] = row[4]
+		self.last_modified: Optional[str] = row[5]
+		self.expires_at: float = row[6]
+
+	@property
+	def is_fresh(self) -> bool:
+		return time.time() < self.expires_at
+
+	def to_response(self, request: requests.PreparedRequest) -> Response:
+		response = Response()
+		response.status_code = 200
+		response.url = self.url
+		response.headers = CaseInsensitiveDict(self.headers)
+		response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+		response.request = request
+		response._content = self.body
+		response.from_cache = True
+		return response
+
+
+class ResponseCache:
+	"""
+	Persistent sqlite-backed cache for api responses, can be shared by several processes.
+
+	Only successful responses of requests that match one of the ttl rules are cached.
+	Stale entries that have an ETag or Last-Modified header are revalidated with a conditional request,
+	others are fetched again. When the cache grows larger than `max_size` the least recently used entries are evicted.
+	"""
+
+	# (http method, url regex, time to live in seconds)
+	# the project and file endpoints include the download counts, thus they are cached only for a short time
+	default_ttl_rules: List[Tuple[str, str, float]] = [
+		("GET", r"^https://api\.curseforge\.com/v1/mods/\d+/description", 24 * 3600),
+		("GET", r"^https://api\.curseforge\.com/v1/mods/search", 24 * 3600),
+		("GET", r"^https://api\.curseforge\.com/v1/mods/\d+/files/\d+", 10 * 60),
+		("GET", r"^https://api\.curseforge\.com/v1/mods/\d+/files", 10 * 60),
+		("GET", r"^https://api\.curseforge\.com/v1/mods/\d+$", 10 * 60),
+		("POST", r"^https://api\.curseforge\.com/v1/mods(/files)?$", 10 * 60),
+		("GET", r"^https://www\.modpackindex\.com/api/", 24 * 3600),
+	]
+
+	def __init__(self, db_path: str = "http_cache.db", ttl_rules: List[Tuple[str, str, float]] = None, max_size: int = 256 * 1024 * 1024):
+		"""
+		:param db_path: path of the sqlite database file
+		:param ttl_rules: list of (http method, url regex, ttl in seconds), the first matching rule is used, replaces the default rules
+		:param max_size: max size of all cached response bodies in bytes
+		"""
+		self.ttl_rules = [(method, re.compile(pattern), ttl) for method, pattern, ttl in (ttl_rules if ttl_rules is not None else self.default_ttl_rules)]
+		self.max_size = max_size
+		self.hits: int = 0
+		self.misses: int = 0
+		self.revalidated: int = 0
+		self._puts_since_size_check: int = 0
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		self._db.execute("PRAGMA synchronous=NORMAL")
+		self._db.execute("""
+			CREATE TABLE IF NOT EXISTS response (
+				key TEXT PRIMARY KEY,
+				url TEXT NOT NULL,
+				headers TEXT NOT NULL,
+				body BLOB NOT NULL,
+				etag TEXT,
+				last_modified TEXT,
+				expires_at REAL NOT NULL,
+				last_access REAL NOT NULL,
+				size INTEGER NOT NULL
+			)
+		""")
+		self._db.execute("CREATE INDEX IF NOT EXISTS response_last_access ON response (last_access)")
+
+	def close(self):
+		with self._lock:
+			self._db.close()
+
+	def get_ttl(self, method: str, url: str) -> Optional[float]:
+		"""
+		:return: time to live of the response or None if the response of the request shouldn't be cached
+		"""
+		for rule_method, pattern, ttl in self.ttl_rules:
+			if rule_method == method and pattern.search(url):
+				return ttl
+		return None
+
+	@staticmethod
+	def get_key(request: requests.PreparedRequest) -> str:
+		body = request.body if request.body else b""
+		if isinstance(body, str):
+			body = body.encode()
+		return hashlib.sha1(request.method.encode() + b" " + request.url.encode() + b"\n" + body).hexdigest()
+
+	def get(self, key: str) -> Optional[CachedEntry]:
+		with self._lock:
+			row = self._db.execute("SELECT key, url, headers, body, etag, last_modified, expires_at FROM response WHERE key = ?", (key,)).fetchone()
+			if row:
+				self._db.execute("UPDATE response SET last_access = ? WHERE key = ?", (time.time(), key))
+		return CachedEntry(row) if row else None
+
+	def put(self, key: str, response: Response, ttl: float):
+		now = time.time()
+		headers = dict(response.headers)
+		body = response.content
+		with self._lock:
+			self._db.execute(
+				"INSERT OR REPLACE INTO response (key, url, headers, body, etag, last_modified, expires_at, last_access, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				(key, response.url, json.dumps(headers), body, headers.get('ETag'), headers.get('Last-Modified'), now + ttl, now, len(body))
+			)
+			self._puts_since_size_check += 1
+			if self._puts_since_size_check >= 50:
+				self._puts_since_size_check = 0
+				self._evict()
+
+	def refresh(self, key: str, ttl: float):
+		now = time.time()
+		with self._lock:
+			self._db.execute("UPDATE response SET expires_at = ?, last_access = ? WHERE key = ?", (now + ttl, now, key))
+
+	def _evict(self):
+		total_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+		if total_size <= self.max_size:
+			return
+
+		target_size = self.max_size * 0.9
+		evicted = []
+		for key, size in self._db.execute("SELECT key, size FROM response ORDER BY last_access"):
+			if total_size <= target_size:
+				break
+			evicted.append((key,))
+			total_size -= size
+		self._db.executemany("DELETE FROM response WHERE key = ?", evicted)
+
+	def clear(self):
+		with self._lock:
+			self._db.execute("DELETE FROM response")
+
+	def stats(self) -> dict:
+		with self._lock:
+			count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response").fetchone()
+			return dict(hits=self.hits, misses=self.misses, revalidated=self.revalidated, entries=count, size=size)
+
+	def _count(self, counter: str):
+		# the cache is shared by the worker threads
+		with self._lock:
+			setattr(self, counter, getattr(self, counter) + 1)
+
+	def fetch(self, request: requests.PreparedRequest, send: Callable[[requests.PreparedRequest], Response]) -> Response:
+		"""
+		Returns the cached response if it is fresh, otherwise sends the (conditional) request and caches the response
+		:param request:
+		:param send: function that sends the request
+		"""
+		ttl = self.get_ttl(request.method, request.url)
+		if ttl is None:
+			return send(request)
+
+		key = self.get_key(request)
+		entry = self.get(key)
+		if entry and entry.is_fresh:
+			self._count('hits')
+			return entry.to_response(request)
+
+		if entry:
+			if entry.etag:
+				request.headers['If-None-Match'] = entry.etag
+			if entry.last_modified:
+				request.headers['If-Modified-Since'] = entry.last_modified
+
+		response = send(request)
+		if entry and response.status_code == 304:
+			self._count('revalidated')
+			self.refresh(key, ttl)
+			return entry.to_response(request)
+
+		self._count('misses')
+		if response.status_code == 200:
+			self.put(key, response, ttl)
+		return response
@@ -1,7 +1,14 @@
 import abc
+import importlib.util
+import os
+import sqlite3
+import time
+import uuid
 from datetime import datetime
 import dataset
-from typing import List
+from dataset import Table
+from sqlalchemy import Index
+from typing import List, Dict, Optional
 
 
 def parse_datetime_string(datetime_str: str) -> float:
@@ -104,6 +111,13 @@ class SaveHandlerInterface(metaclass=abc.ABCMeta):
 		"""
 		pass
 
+	def flush(self):
+		"""
+		Writes buffered data, save handlers that don't buffer writes can ignore it
+		:return:
+		"""
+		pass
+
 
 # TODO create JsonSaveHandler
 # class JsonSaveHandler(SaveHandlerInterface)
@@ -131,17 +145,27 @@ class DatasetSaveHandler(SaveHandlerInterface):
 			db_util.create_view_dependant_downloads(self.db)
 
 	def is_saved_project_outdated(self, project_id: int, project_date_modified: str, project_download_count: int) -> bool:
+		project = self._get_saved_project(project_id)
+		if project and parse_datetime_string(project_date_modified) > project['date_modified']:
+			return True
+
+		download_count = self._get_saved_download_count(project_id)
+		return download_count is None or download_count != project_download_count
+
+	def _get_saved_project(self, project_id: int) -> Optional[dict]:
 		if self.db.has_table('project'):
-			result = self.db['project'].find_one(id=project_id)
-			if result and parse_datetime_string(project_date_modified) > result['date_modified']:
-				return True
+			return self.db['project'].find_one(id=project_id)
+		return None
 
+	def _get_saved_download_count(self, project_id: int) -> Optional[int]:
+		"""
+		:return: the latest saved download count of the project, None if none was saved
+		"""
 		if self.db.has_table('project_downloads'):
 			import db_util
 			for row in db_util.get_project_download_count_latest(self.db, project_id):
-				return row['download_count'] != project_download_count
-
-		return True
+				return row['download_count']
+		return None
 
 	def save_project_info(self, p_id: int, slug: str, name: str, p_type: str, mc_versions: List[str], summary: str, logo_url: str, date_created: str, date_modified: str):
 		self.db['project'].upsert(dict(
@@ -199,3 +223,714 @@ class DatasetSaveHandler(SaveHandlerInterface):
 			project_id=project_id, file_id=file_id,
 			dependency_project_id=dependency_project_id, dependency_file_id=dependency_file_id
 		), ['id', 'project_id', 'dependency_project_id', 'dependency_file_id'])
+
+
+class BufferedDatasetSaveHandler(DatasetSaveHandler):
+	"""
+	DatasetSaveHandler that buffers the rows per table and writes them with multi-row statements.
+
+	Rows are deduplicated by their key within the run, matching what the unbuffered handler writes:
+	for the `upsert_keys` tables the last saved row wins, for the `insert_keys` tables the first saved row wins and later ones are ignored.
+	The buffer is flushed once it holds `flush_threshold` rows and with `flush()`, the outdated check reads the buffered rows before the db.
+	Each flush runs in its own transaction, or in a SAVEPOINT if the caller already started a transaction,
+	thus a failed flush doesn't roll back the caller's transaction and keeps the rows buffered.
+	Upserts are multi-row INSERT ... ON CONFLICT statements, the unique index they need on the key columns is created if it is missing.
+	"""
+
+	# table -> key columns, rows with the same key replace each other
+	upsert_keys = {
+		'project': ['id'],
+		'project_authors': ['project_id', 'author_id'],
+		'author': ['id'],
+		'file': ['project_id', 'file_id'],
+	}
+	# table -> key columns, rows whose key already exists are ignored
+	insert_keys = {
+		'project_downloads': ['timestamp', 'project_id'],
+		'file_downloads': ['timestamp', 'project_id', 'file_id'],
+		'file_dependencies': ['project_id', 'file_id', 'dependency_project_id', 'dependency_file_id'],
+	}
+	# dialect -> max number of bound parameters per statement, SQLite before 3.32 allows only 999
+	max_variables = {'sqlite': 999, 'postgresql': 32767, 'mysql': 65535}
+
+	def __init__(self, db_url: str, timestamp: int, batch_size: int = 1000, flush_threshold: int = 50000):
+		"""
+		:param db_url: SQLite, PostgreSQL or MySQL
+		:param timestamp: when was the data collected/saved
+		:param batch_size: max number of rows per statement, fewer rows are used if the statement would exceed the bound parameter limit of the db
+		:param flush_threshold: max number of buffered rows
+		"""
+		self.batch_size = batch_size
+		self.flush_threshold = flush_threshold
+		self._buffers = {table: {} for table in [*self.upsert_keys, *self.insert_keys]}  # table -> key -> row
+		self._buffered_count = 0
+		self._upsert_tables = set()  # tables whose columns and unique index are known to exist
+		super().__init__(db_url, timestamp)
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		if exc_type is None:
+			self.flush()
+		super().__exit__(exc_type, exc_val, exc_tb)
+
+	def _buffer(self, table: str, row: dict):
+		keys = self.upsert_keys.get(table) or self.insert_keys[table]
+		key = tuple(row[column] for column in keys)
+		buffer = self._buffers[table]
+		if key not in buffer:
+			self._buffered_count += 1
+		if table in self.upsert_keys or key not in buffer:
+			buffer[key] = row
+		if self._buffered_count >= self.flush_threshold:
+			self.flush()
+
+	def flush(self):
+		if self._buffered_count == 0:
+			return
+		if self.db.in_transaction:
+			savepoint = self.db.executable.begin_nested()
+			try:
+				self._write_buffers()
+			except BaseException:
+				savepoint.rollback()
+				raise
+			savepoint.commit()
+		else:
+			with self.db:
+				self._write_buffers()
+
+		# the buffers are only cleared once all tables are written, a failed flush can be retried
+		for buffer in self._buffers.values():
+			buffer.clear()
+		self._buffered_count = 0
+
+	def _write_buffers(self):
+		for table, buffer in self._buffers.items():
+			if len(buffer) == 0:
+				continue
+			rows = list(buffer.values())
+			if table in self.upsert_keys:
+				self._upsert_many(table, self.upsert_keys[table], rows)
+			else:
+				rows = self._filter_existing(table, self.insert_keys[table], rows)
+				self.db[table].insert_many(rows, chunk_size=self.batch_size)
+
+	def _upsert_many(self, table_name: str, keys: List[str], rows: List[dict]):
+		"""
+		Inserts the rows or updates the columns of the rows that already exist, columns that aren't in the rows keep their values
+		"""
+		table = self._prepare_upsert_table(table_name, keys, rows[0])
+		dialect = self.db.engine.dialect.name
+		# every row of a multi-row insert binds one parameter per column
+		batch_size = self._get_batch_size(len(rows[0]))
+		for i in range(0, len(rows), batch_size):
+			if dialect == "mysql":
+				from sqlalchemy.dialects.mysql import insert
+				statement = insert(table.table).values(rows[i:i + batch_size])
+				statement = statement.on_duplicate_key_update({column: statement.inserted[column] for column in rows[0] if column not in keys})
+			else:
+				if dialect == "postgresql":
+					from sqlalchemy.dialects.postgresql import insert
+				else:
+					from sqlalchemy.dialects.sqlite import insert
+				statement = insert(table.table).values(rows[i:i + batch_size])
+				statement = statement.on_conflict_do_update(index_elements=keys, set_={column: statement.excluded[column] for column in rows[0] if column not in keys})
+			self.db.executable.execute(statement)
+
+	def _prepare_upsert_table(self, table_name: str, keys: List[str], example_row: dict) -> Table:
+		"""
+		Creates the table, its missing columns and the unique index on the key columns, which ON CONFLICT requires
+		"""
+		table = self.db[table_name] if self.db.has_table(table_name) else self.db.create_table(table_name)
+		if table_name in self._upsert_tables:
+			return table
+
+		for column, value in example_row.items():
+			table.create_column_by_example(column, value)
+		if keys != [column.name for column in table.table.primary_key.columns]:
+			indexes = self.db.inspect.get_indexes(table_name, schema=self.db.schema)
+			if not any(index['unique'] and set(index['column_names']) == set(keys) for index in indexes):
+				Index(f"{table_name}_{'_'.join(keys)}_unique", *[table.table.c[column] for column in keys], unique=True).create(self.db.executable)
+		self._upsert_tables.add(table_name)
+		return table
+
+	def _get_batch_size(self, variables_per_row: int, extra_variables: int = 0) -> int:
+		"""
+		:return: max number of rows per statement that doesn't exceed the bound parameter limit of the db
+		"""
+		max_variables = self.max_variables.get(self.db.engine.dialect.name, 999) - extra_variables
+		return max(1, min(self.batch_size, max_variables // variables_per_row))
+
+	def _iter_key_groups(self, keys: List[str], rows: List[dict]):
+		"""
+		Groups the rows by the first key column, so the rows of a group can be matched with an IN clause on the second key column
+		"""
+		groups = {}
+		for row in rows:
+			groups.setdefault(row[keys[0]], set()).add(row[keys[1]])
+		batch_size = self._get_batch_size(1, extra_variables=1)
+		for first, values in groups.items():
+			values = list(values)
+			for i in range(0, len(values), batch_size):
+				yield {keys[0]: first, keys[1]: values[i:i + batch_size]}
+
+	def _filter_existing(self, table: str, keys: List[str], rows: List[dict]) -> List[dict]:
+		if not self.db.has_table(table):
+			return rows
+		existing = set()
+		for filters in self._iter_key_groups(keys, rows):
+			for row in self.db[table].find(**filters):
+				existing.add(tuple(row[column] for column in keys))
+		return [row for row in rows if tuple(row[column] for column in keys) not in existing]
+
+	def _get_saved_project(self, project_id: int) -> Optional[dict]:
+		project = self._buffers['project'].get((project_id,))
+		return project if project is not None else super()._get_saved_project(project_id)
+
+	def _get_saved_download_count(self, project_id: int) -> Optional[int]:
+		# a buffered count was collected in this run and thus is newer than any count in the db
+		downloads = self._buffers['project_downloads'].get((self.timestamp, project_id))
+		return downloads['download_count'] if downloads is not None else super()._get_saved_download_count(project_id)
+
+	def save_project_info(self, p_id: int, slug: str, name: str, p_type: str, mc_versions: List[str], summary: str, logo_url: str, date_created: str, date_modified: str):
+		self._buffer('project', dict(
+			id=p_id,
+			slug=slug, name=name,
+			type=p_type,
+			mc_version=", ".join(mc_versions),
+			summary=summary,
+			logo=logo_url,
+			date_created=parse_datetime_string(date_created),
+			date_modified=parse_datetime_string(date_modified),
+			date_collected=self.timestamp
+		))
+
+	def save_project_authors(self, project_id: int, authors: List[dict]):
+		for author in authors:
+			self._buffer('project_authors', dict(project_id=project_id, author_id=author['id'], timestamp=self.timestamp))
+			self._save_author(author['id'], author['name'])
+
+	def _save_author(self, a_id: int, name: str):
+		self._buffer('author', dict(id=a_id, name=name))
+
+	def save_project_download_count(self, project_id: int, download_count: int):
+		self._buffer('project_downloads', dict(project_id=project_id, download_count=download_count, timestamp=self.timestamp))
+
+	def save_file_info(self, project_id: int, file_id: int, release_type: str, mc_versions: List[str], display_name: str, file_name: str, date_created: int, file_length: int):
+		self._buffer('file', dict(
+			project_id=project_id, file_id=file_id,
+			display_name=display_name, file_name=file_name,
+			release_type=release_type,
+			mc_versions=", ".join(mc_versions),
+			date_created=date_created,
+			size=file_length
+		))
+
+	def save_file_download_count(self, project_id: int, file_id: int, download_count: int):
+		self._buffer('file_downloads', dict(project_id=project_id, file_id=file_id, download_count=download_count, timestamp=self.timestamp))
+
+	def save_file_dependency(self, project_id: int, file_id: int, dependency_project_id: int, dependency_file_id: int):
+		self._buffer('file_dependencies', dict(
+			project_id=project_id, file_id=file_id,
+			dependency_project_id=dependency_project_id, dependency_file_id=dependency_file_id
+		))
+
+
+class Sqlite3SaveHandler(SaveHandlerInterface):
+	"""
+	Save handler on plain sqlite3 with an explicit relational schema.
+
+	Uses the table and column names of the DatasetSaveHandler, thus `db_util` and the dashboard work with both databases,
+	but every table has a real primary key and the indexes cover the queries of `db_util`.
+	All writes of the handler belong to one transaction, which is committed on `commit()` or when the handler is closed without an error.
+	"""
+
+	# every entry migrates the schema from the previous version, the index + 1 is stored as `PRAGMA user_version`
+	schema_migrations: List[List[str]] = [
+		[
+			"""
+			CREATE TABLE project (
+				id INTEGER PRIMARY KEY,
+				slug TEXT NOT NULL,
+				name TEXT NOT NULL,
+				type TEXT,
+				mc_version TEXT,
+				summary TEXT,
+				logo TEXT,
+				date_created REAL,
+				date_modified REAL,
+				date_collected INTEGER
+			)
+			""",
+			"CREATE INDEX project_slug ON project (slug)",
+			"""
+			CREATE TABLE author (
+				id INTEGER PRIMARY KEY,
+				name TEXT
+			)
+			""",
+			"""
+			CREATE TABLE project_authors (
+				project_id INTEGER NOT NULL,
+				author_id INTEGER NOT NULL,
+				timestamp INTEGER,
+				PRIMARY KEY (project_id, author_id)
+			) WITHOUT ROWID
+			""",
+			"""
+			CREATE TABLE project_downloads (
+				project_id INTEGER NOT NULL,
+				timestamp INTEGER NOT NULL,
+				download_count INTEGER NOT NULL,
+				PRIMARY KEY (project_id, timestamp)
+			) WITHOUT ROWID
+			""",
+			"""
+			CREATE TABLE file (
+				project_id INTEGER NOT NULL,
+				file_id INTEGER NOT NULL,
+				display_name TEXT,
+				file_name TEXT,
+				release_type TEXT,
+				mc_versions TEXT,
+				date_created TEXT,
+				size INTEGER,
+				PRIMARY KEY (project_id, file_id)
+			) WITHOUT ROWID
+			""",
+			# the primary key covers the joins with file_dependencies and the per project queries of db_util
+			"""
+			CREATE TABLE file_downloads (
+				project_id INTEGER NOT NULL,
+				file_id INTEGER NOT NULL,
+				timestamp INTEGER NOT NULL,
+				download_count INTEGER NOT NULL,
+				PRIMARY KEY (project_id, file_id, timestamp)
+			) WITHOUT ROWID
+			""",
+			"CREATE INDEX file_downloads_timestamp ON file_downloads (project_id, timestamp, download_count)",
+			"""
+			CREATE TABLE file_dependencies (
+				project_id INTEGER NOT NULL,
+				file_id INTEGER NOT NULL,
+				dependency_project_id INTEGER NOT NULL,
+				dependency_file_id INTEGER NOT NULL,
+				PRIMARY KEY (project_id, file_id, dependency_project_id, dependency_file_id)
+			) WITHOUT ROWID
+			""",
+			"CREATE INDEX file_dependencies_dependency ON file_dependencies (dependency_project_id, project_id, file_id)",
+		],
+	]
+
+	def __init__(self, db_path: str, timestamp: int, cache_size_mb: int = 64):
+		"""
+		:param db_path: path of the sqlite database file
+		:param timestamp: when was the data collected/saved
+		:param cache_size_mb: size of the page cache in MiB
+		"""
+		self.timestamp = timestamp
+		self._saved_authors = {}  # author id -> name, skips writing the same author for every project
+		# the statement cache keeps the prepared statements of the handler, they are reused for every row
+		self.db = sqlite3.connect(db_path, timeout=60, cached_statements=256)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.execute("PRAGMA synchronous=NORMAL")
+		self.db.execute("PRAGMA temp_store=MEMORY")
+		self.db.execute(f"PRAGMA cache_size={-cache_size_mb * 1024}")
+		self.db.execute(f"PRAGMA mmap_size={256 * 1024 * 1024}")
+		self._migrate_schema()
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		if exc_type is None:
+			self.commit()
+		else:
+			self.rollback()
+		self.db.execute("PRAGMA optimize")
+		self.db.close()
+
+	@property
+	def schema_version(self) -> int:
+		return self.db.execute("PRAGMA user_version").fetchone()[0]
+
+	def _migrate_schema(self):
+		import db_util
+		version = self.schema_version
+		with self.db:
+			self.db.execute("BEGIN")  # DDL statements don't open a transaction implicitly
+			for migration in self.schema_migrations[version:]:
+				for statement in migration:
+					self.db.execute(statement)
+			self.db.execute(f"PRAGMA user_version = {len(self.schema_migrations)}")
+
+			if self.db.execute("SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = 'dependant_downloads'").fetchone() is None:
+				self.db.execute(db_util.DEPENDANT_DOWNLOADS_VIEW)
+
+	def commit(self):
+		self.db.commit()
+
+	def rollback(self):
+		self.db.rollback()
+		self._saved_authors.clear()
+
+	def is_saved_project_outdated(self, project_id: int, project_date_modified: str, project_download_count: int) -> bool:
+		row = self.db.execute("SELECT date_modified FROM project WHERE id = ?", (project_id,)).fetchone()
+		if row and parse_datetime_string(project_date_modified) > row[0]:
+			return True
+
+		row = self.db.execute(
+			"SELECT download_count FROM project_downloads WHERE project_id = ? ORDER BY timestamp DESC LIMIT 1", (project_id,)
+		).fetchone()
+		if row:
+			return row[0] != project_download_count
+
+		return True
+
+	def save_project_info(self, p_id: int, slug: str, name: str, p_type: str, mc_versions: List[str], summary: str, logo_url: str, date_created: str, date_modified: str):
+		self.db.execute("""
+			INSERT INTO project (id, slug, name, type, mc_version, summary, logo, date_created, date_modified, date_collected) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+			ON CONFLICT (id) DO UPDATE SET
+				slug = excluded.slug, name = excluded.name, type = excluded.type, mc_version = excluded.mc_version, summary = excluded.summary,
+				logo = excluded.logo, date_created = excluded.date_created, date_modified = excluded.date_modified, date_collected = excluded.date_collected
+		""", (
+			p_id, slug, name, p_type, ", ".join(mc_versions), summary, logo_url,
+			parse_datetime_string(date_created), parse_datetime_string(date_modified), self.timestamp
+		))
+
+	def save_project_authors(self, project_id: int, authors: List[dict]):
+		self.db.executemany("""
+			INSERT INTO project_authors (project_id, author_id, timestamp) VALUES (?, ?, ?)
+			ON CONFLICT (project_id, author_id) DO UPDATE SET timestamp = excluded.timestamp
+		""", [(project_id, author['id'], self.timestamp) for author in authors])
+
+		for author in authors:
+			self._save_author(author['id'], author['name'])
+
+	def _save_author(self, a_id: int, name: str):
+		if self._saved_authors.get(a_id) == name:
+			return
+		self.db.execute("INSERT INTO author (id, name) VALUES (?, ?) ON CONFLICT (id) DO UPDATE SET name = excluded.name", (a_id, name))
+		self._saved_authors[a_id] = name
+
+	def save_project_download_count(self, project_id: int, download_count: int):
+		self.db.execute(
+			"INSERT OR REPLACE INTO project_downloads (project_id, timestamp, download_count) VALUES (?, ?, ?)",
+			(project_id, self.timestamp, download_count)
+		)
+
+	def save_file_info(self, project_id: int, file_id: int, release_type: str, mc_versions: List[str], display_name: str, file_name: str, date_created: int, file_length: int):
+		self.db.execute("""
+			INSERT INTO file (project_id, file_id, display_name, file_name, release_type, mc_versions, date_created, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+			ON CONFLICT (project_id, file_id) DO UPDATE SET
+				display_name = excluded.display_name, file_name = excluded.file_name, release_type = excluded.release_type,
+				mc_versions = excluded.mc_versions, date_created = excluded.date_created, size = excluded.size
+		""", (project_id, file_id, display_name, file_name, release_type, ", ".join(mc_versions), date_created, file_length))
+
+	def save_file_download_count(self, project_id: int, file_id: int, download_count: int):
+		self.db.execute(
+			"INSERT OR REPLACE INTO file_downloads (project_id, file_id, timestamp, download_count) VALUES (?, ?, ?, ?)",
+			(project_id, file_id, self.timestamp, download_count)
+		)
+
+	def save_file_dependency(self, project_id: int, file_id: int, dependency_project_id: int, dependency_file_id: int):
+		self.db.execute(
+			"INSERT OR IGNORE INTO file_dependencies (project_id, file_id, dependency_project_id, dependency_file_id) VALUES (?, ?, ?, ?)",
+			(project_id, file_id, dependency_project_id, dependency_file_id)
+		)
+
+	def import_dataset_db(self, source_path: str) -> Dict[str, int]:
+		"""
+		Imports the data of a database that was created by the DatasetSaveHandler.
+		Rows that violate the new primary keys are merged, the last imported row wins.
+		:param source_path: path of the sqlite database file
+		:return: number of rows per table after the import
+		"""
+		self.db.commit()
+		self.db.execute("ATTACH DATABASE ? AS source", (source_path,))
+		try:
+			source_tables = {row[0] for row in self.db.execute("SELECT name FROM source.sqlite_master WHERE type = 'table'")}
+			counts = {}
+			with self.db:
+				for table in ['project', 'author', 'project_authors', 'project_downloads', 'file', 'file_downloads', 'file_dependencies']:
+					if table not in source_tables:
+						continue
+					columns = [row[1] for row in self.db.execute(f"PRAGMA main.table_info({table})")]
+					source_columns = {row[1] for row in self.db.execute(f"PRAGMA source.table_info({table})")}
+					columns = [column for column in columns if column in source_columns]
+					conflict = "IGNORE" if table == 'file_dependencies' else "REPLACE"
+					self.db.execute(f"""
+						INSERT OR {conflict} INTO main.{table} ({", ".join(columns)})
+						SELECT {", ".join(columns)} FROM source.{table} ORDER BY rowid
+					""")
+					counts[table] = self.db.execute(f"SELECT COUNT(*) FROM main.{table}").fetchone()[0]
+		finally:
+			self.db.execute("DETACH DATABASE source")
+		self.db.execute("ANALYZE")
+		self._saved_authors.clear()
+		return counts
+
+
+class ParquetSaveHandler(SaveHandlerInterface):
+	"""
+	Save handler that stores the data of every collection as a Parquet partition, requires the `pyarrow` package.
+
+	Every table is a folder with one `timestamp=<collection timestamp>` partition per collection (hive partitioning).
+	The download time series grow by one partition per run and are never rewritten,
+	the other tables store a snapshot of the rows saved in the run and are read with the row of the newest partition winning.
+	Ids are dictionary encoded, counts are delta encoded and all columns are zstd compressed.
+	Use the ParquetStatsReader to load the data.
+	"""
+
+	# table -> column -> arrow type name, the timestamp is the partition key
+	tables: Dict[str, Dict[str, str]] = {
+		'project': dict(id='int64', slug='string', name='string', type='string', mc_version='string', summary='string', logo='string', date_created='float64', date_modified='float64', date_collected='int64'),
+		'author': dict(id='int64', name='string'),
+		'project_authors': dict(project_id='int64', author_id='int64'),
+		'project_downloads': dict(project_id='int64', download_count='int64'),
+		'file': dict(project_id='int64', file_id='int64', display_name='string', file_name='string', release_type='string', mc_versions='string', date_created='string', size='int64'),
+		'file_downloads': dict(project_id='int64', file_id='int64', download_count='int64'),
+		'file_dependencies': dict(project_id='int64', file_id='int64', dependency_project_id='int64', dependency_file_id='int64'),
+	}
+	dictionary_columns = ['id', 'project_id', 'file_id', 'author_id', 'dependency_project_id', 'dependency_file_id', 'type', 'release_type', 'mc_versions', 'mc_version']
+	delta_columns = ['download_count', 'size', 'date_collected']
+
+	def __init__(self, folder_path: str, timestamp: int, compression_level: int = 9, flush_threshold: int = 500000):
+		"""
+		:param folder_path: root folder of the tables
+		:param timestamp: when was the data collected/saved
+		:param compression_level: zstd compression level
+		:param flush_threshold: max number of buffered rows, every flush writes one part file per table
+		"""
+		if importlib.util.find_spec("pyarrow") is None:  # fail early if the optional dependency is missing
+			raise ImportError("ParquetSaveHandler requires the 'pyarrow' package")
+		self.folder_path = folder_path
+		self.timestamp = timestamp
+		self.compression_level = compression_level
+		self.flush_threshold = flush_threshold
+		self._buffers = {table: {} for table in self.tables}  # table -> key -> row, rows with the same key replace each other
+		self._buffered_count = 0
+		self._reader = ParquetStatsReader(folder_path)
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		# the rows of a failed collection are incomplete, e.g. dependents may be missing, and would be read as a complete snapshot
+		if exc_type is None:
+			self.flush()
+		else:
+			self._discard()
+
+	def _discard(self):
+		for buffer in self._buffers.values():
+			buffer.clear()
+		self._buffered_count = 0
+
+	def flush(self):
+		import pyarrow as pa
+		import pyarrow.parquet as pq
+
+		if self._buffered_count == 0:
+			return
+		for table, buffer in self._buffers.items():
+			if len(buffer) == 0:
+				continue
+			columns = self.tables[table]
+			rows = sorted(buffer.values(), key=lambda row: tuple(row[column] for column in list(columns)[:2]))  # sorted ids compress better
+			arrow_table = pa.table({
+				column: pa.array([row[column] for row in rows], type=getattr(pa, type_name)()) for column, type_name in columns.items()
+			})
+
+			partition_path = os.path.join(self.folder_path, table, f"timestamp={self.timestamp}")
+			os.makedirs(partition_path, exist_ok=True)
+			# the time prefix keeps the parts in write order, the pid and uuid keep concurrent writers from picking the same name
+			part_name = f"part-{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex}.parquet"
+			temp_path = os.path.join(partition_path, f".{part_name}.tmp")  # hidden from readers until it is complete
+			pq.write_table(
+				arrow_table, temp_path,
+				compression='zstd', compression_level=self.compression_level,
+				use_dictionary=[column for column in columns if column in self.dictionary_columns],
+				column_encoding={column: 'DELTA_BINARY_PACKED' for column in columns if column in self.delta_columns}
+			)
+			os.replace(temp_path, os.path.join(partition_path, part_name))
+			buffer.clear()
+		self._buffered_count = 0
+
+	def _buffer(self, table: str, key: tuple, row: dict):
+		buffer = self._buffers[table]
+		if key not in buffer:
+			self._buffered_count += 1
+		buffer[key] = row
+		if self._buffered_count >= self.flush_threshold:
+			self.flush()
+
+	def is_saved_project_outdated(self, project_id: int, project_date_modified: str, project_download_count: int) -> bool:
+		# buffered rows were collected in this run and thus are newer than the written partitions
+		project = self._buffers['project'].get((project_id,)) or self._reader.get_project(project_id=project_id)
+		if project and parse_datetime_string(project_date_modified) > project['date_modified']:
+			return True
+
+		downloads = self._buffers['project_downloads'].get((project_id,))
+		download_count = downloads['download_count'] if downloads else self._reader.get_project_download_count_latest(project_id)
+		if download_count is not None:
+			return download_count != project_download_count
+
+		return True
+
+	def save_project_info(self, p_id: int, slug: str, name: str, p_type: str, mc_versions: List[str], summary: str, logo_url: str, date_created: str, date_modified: str):
+		self._buffer('project', (p_id,), dict(
+			id=p_id, slug=slug, name=name, type=p_type,
+			mc_version=", ".join(mc_versions), summary=summary, logo=logo_url,
+			date_created=parse_datetime_string(date_created), date_modified=parse_datetime_string(date_modified),
+			date_collected=self.timestamp
+		))
+
+	def save_project_authors(self, project_id: int, authors: List[dict]):
+		for author in authors:
+			self._buffer('project_authors', (project_id, author['id']), dict(project_id=project_id, author_id=author['id']))
+			self._buffer('author', (author['id'],), dict(id=author['id'], name=author['name']))
+
+	def save_project_download_count(self, project_id: int, download_count: int):
+		self._buffer('project_downloads', (project_id,), dict(project_id=project_id, download_count=download_count))
+
+	def save_file_info(self, project_id: int, file_id: int, release_type: str, mc_versions: List[str], display_name: str, file_name: str, date_created: int, file_length: int):
+		self._buffer('file', (project_id, file_id), dict(
+			project_id=project_id, file_id=file_id,
+			display_name=display_name, file_name=file_name,
+			release_type=release_type, mc_versions=", ".join(mc_versions),
+			date_created=date_created, size=file_length
+		))
+
+	def save_file_download_count(self, project_id: int, file_id: int, download_count: int):
+		self._buffer('file_downloads', (project_id, file_id), dict(project_id=project_id, file_id=file_id, download_count=download_count))
+
+	def save_file_dependency(self, project_id: int, file_id: int, dependency_project_id: int, dependency_file_id: int):
+		self._buffer('file_dependencies', (project_id, file_id, dependency_project_id, dependency_file_id), dict(
+			project_id=project_id, file_id=file_id,
+			dependency_project_id=dependency_project_id, dependency_file_id=dependency_file_id
+		))
+
+
+class ParquetStatsReader:
+	"""
+	Loads the data of the ParquetSaveHandler, the frames have the same columns as the results of the `db_util` queries the dashboard uses.
+	Requires the `pyarrow` and `pandas` packages.
+	"""
+
+	def __init__(self, folder_path: str):
+		self.folder_path = folder_path
+
+	def _read(self, table: str, filters=None, columns: List[str] = None):
+		"""
+		:return: DataFrame of the table including the partition timestamp
+		"""
+		import pandas as pd
+		import pyarrow.dataset as ds
+
+		path = os.path.join(self.folder_path, table)
+		if not os.path.isdir(path):
+			return pd.DataFrame(columns=[*(columns if columns else ParquetSaveHandler.tables[table]), 'timestamp'])
+		dataset_ = ds.dataset(path, format='parquet', partitioning='hive')
+		return dataset_.to_table(filter=filters, columns=[*columns, 'timestamp'] if columns else None).to_pandas()
+
+	def _read_series(self, table: str, keys: List[str], filters=None, columns: List[str] = None):
+		"""
+		:return: DataFrame of the table with only the newest row per key and timestamp, a run can write the same row to several parts
+		"""
+		return self._read(table, filters, columns).drop_duplicates([*keys, 'timestamp'], keep='last')
+
+	def _read_latest(self, table: str, keys: List[str], filters=None):
+		"""
+		:return: DataFrame of the table with only the newest row per key
+		"""
+		df = self._read(table, filters)
+		return df.sort_values('timestamp').drop_duplicates(keys, keep='last').drop(columns=['timestamp'])
+
+	def get_project(self, project_id: int = None, slug: str = None) -> Optional[dict]:
+		import pyarrow.dataset as ds
+		df = self._read_latest('project', ['id'], ds.field('id') == project_id if project_id is not None else ds.field('slug') == slug)
+		return df.iloc[0].to_dict() if len(df) > 0 else None
+
+	def get_tracked_projects_with_logo(self) -> List[dict]:
+		return self._read_latest('project', ['id'])[['slug', 'type', 'logo', 'date_collected']].to_dict('records')
+
+	def get_project_download_count_latest(self, project_id: int) -> Optional[int]:
+		import pyarrow.dataset as ds
+		df = self._read_series('project_downloads', ['project_id'], ds.field('project_id') == project_id)
+		return int(df.sort_values('timestamp').iloc[-1]['download_count']) if len(df) > 0 else None
+
+	def get_project_authors(self, mod_id: int):
+		import pyarrow.dataset as ds
+		project_authors = self._read_series('project_authors', ['author_id'], ds.field('project_id') == mod_id)
+		authors = self._read_latest('author', ['id'])
+		df = project_authors.sort_values('timestamp').drop_duplicates(['author_id'], keep='last')
+		return df.merge(authors, left_on='author_id', right_on='id')[['author_id', 'name', 'timestamp']]
+
+	def get_project_downloads_by_file(self, mod_id: int):
+		import pyarrow.dataset as ds
+		downloads = self._read_series('file_downloads', ['project_id', 'file_id'], ds.field('project_id') == mod_id)
+		files = self._read_latest('file', ['project_id', 'file_id'], ds.field('project_id') == mod_id)[['project_id', 'file_id', 'file_name']]
+		return downloads.merge(files, on=['project_id', 'file_id'])[['project_id', 'file_id', 'file_name', 'download_count', 'timestamp']]
+
+	def get_dependant_downloads(self, mod_id: int):
+		"""
+		Same as the `dependant_downloads` view filtered by the dependency
+		"""
+		import pyarrow.dataset as ds
+		dependencies = self._read('file_dependencies', ds.field('dependency_project_id') == mod_id, columns=['project_id', 'file_id'])
+		dependencies = dependencies[['project_id', 'file_id']].drop_duplicates()
+		if len(dependencies) == 0:
+			return self._empty_frame(['project_id', 'name', 'dependency_project_id', 'download_count', 'timestamp'])
+
+		downloads = self._read_series('file_downloads', ['project_id', 'file_id'], ds.field('project_id').isin(dependencies['project_id'].unique().tolist()))
+		downloads = downloads.merge(dependencies, on=['project_id', 'file_id'])
+		df = downloads.groupby(['project_id', 'timestamp'], as_index=False)['download_count'].sum()
+		projects = self._read_latest('project', ['id'])[['id', 'name']]
+		df = df.merge(projects, left_on='project_id', right_on='id')
+		df['dependency_project_id'] = mod_id
+		return df[['project_id', 'name', 'dependency_project_id', 'download_count', 'timestamp']]
+
+	def get_project_downloads_by_composition(self, mod_id: int):
+		import pyarrow.dataset as ds
+		dependant_downloads = self.get_dependant_downloads(mod_id).groupby('timestamp', as_index=False)['download_count'].sum()
+		project_downloads = self._read_series('project_downloads', ['project_id'], ds.field('project_id') == mod_id)
+		df = dependant_downloads.rename(columns={'download_count': 'dependant_download_count'}).merge(
+			project_downloads.rename(columns={'download_count': 'total_download_count'}), on='timestamp'
+		)
+		df['direct_download_count'] = df['total_download_count'] - df['dependant_download_count']
+		return df[['project_id', 'total_download_count', 'dependant_download_count', 'direct_download_count', 'timestamp']]
+
+	def get_project_downloads_by_origin(self, mod_id: int):
+		import pandas as pd
+		dependant_downloads = self.get_dependant_downloads(mod_id)[['project_id', 'name', 'download_count', 'timestamp']]
+		composition = self.get_project_downloads_by_composition(mod_id)
+		direct_downloads = pd.DataFrame(dict(
+			project_id=composition['project_id'], name="CurseForge Mod Page",
+			download_count=composition['direct_download_count'], timestamp=composition['timestamp']
+		))
+		df = pd.concat([dependant_downloads, direct_downloads], ignore_index=True)
+		df['percentage'] = 100 * df['download_count'] / df.groupby('timestamp')['download_count'].transform('sum')
+		return df[['project_id', 'name', 'download_count', 'percentage', 'timestamp']]
+
+	def get_project_data(self, mod_slug: str):
+		"""
+		Loads the same data as `get_project_data` of the dashboard
+		:return: project, authors, downloads by file, downloads composition, downloads by origin
+		"""
+		import pandas as pd
+		project = self.get_project(slug=mod_slug)
+		if not project:
+			return None
+
+		mod_id = project['id']
+		authors = self.get_project_authors(mod_id)['name'].tolist()
+
+		downloads_by_file = self.get_project_downloads_by_file(mod_id)
+		if len(downloads_by_file) > 0:
+			downloads_by_file['timestamp'] = pd.to_datetime(downloads_by_file['timestamp'], unit='s')
+
+		downloads_by_origin = self.get_project_downloads_by_origin(mod_id)
+		if len(downloads_by_origin) > 0:
+			downloads_by_origin['timestamp'] = pd.to_datetime(downloads_by_origin['timestamp'], unit='s')
+
+		downloads_composition = self.get_project_downloads_by_composition(mod_id)
+		return project, authors, downloads_by_file, downloads_composition, downloads_by_origin
+
+	@staticmethod
+	def _empty_frame(columns: List[str]):
+		import pandas as pd
+		return pd.DataFrame(columns=columns)
@@ -1,8 +1,169 @@
-from typing import Optional, List
+import asyncio
+import logging
+import sqlite3
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Iterator, Tuple
 
 import requests
+from furl import furl
 from requests import Response
 
+from rate_limiter import RateLimiter, RetryPolicy, RateLimitedAdapter, get_shared_rate_limiter, parse_retry_after
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class HttpSessionPool:
+	"""
+	Provides long-lived keep-alive connections that are shared by all api calls.
+
+	All sessions share one HTTPAdapter, whose urllib3 pool manager keeps a separate connection pool per host.
+	Each thread gets its own Session (Session objects aren't thread-safe), but they all draw from the same pools.
+	The sessions are only weakly tracked, thus the session of a finished worker thread is released with the thread.
+	The adapter throttles requests with the (process-wide) rate limiter and retries throttled or failed requests.
+	If a ResponseCache is given, api responses are served from the cache while fresh.
+	"""
+
+	def __init__(self, pool_size: int = 10, max_hosts: int = 10, keep_alive: bool = True, pool_block: bool = False, rate_limiter: RateLimiter = None, retry_policy: RetryPolicy = None, cache: ResponseCache = None):
+		"""
+		:param pool_size: max number of connections that are kept open per host
+		:param max_hosts: max number of per-host connection pools that are cached
+		:param keep_alive: reuse connections between requests, if False every request closes its connection
+		:param pool_block: block instead of opening throwaway connections when all pooled connections of a host are in use
+		:param rate_limiter: per host rate limits, uses the process-wide rate limiter if None
+		:param retry_policy: backoff of retried requests
+		:param cache: persistent cache for the responses of api requests, responses aren't cached if None.
+			The cache is owned by the caller and isn't closed by the pool.
+		"""
+		self.pool_size = pool_size
+		self.keep_alive = keep_alive
+		self.cache: Optional[ResponseCache] = cache
+		self._adapter = RateLimitedAdapter(rate_limiter, retry_policy, pool_connections=max_hosts, pool_maxsize=pool_size, pool_block=pool_block)
+		self._local = threading.local()
+		self._sessions: weakref.WeakSet = weakref.WeakSet()
+		self._lock = threading.Lock()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def session(self) -> requests.Session:
+		"""Returns the session of the calling thread"""
+		session = getattr(self._local, "session", None)
+		if session is None:
+			session = requests.Session()
+			session.mount("https://", self._adapter)
+			session.mount("http://", self._adapter)
+			if not self.keep_alive:
+				session.headers['Connection'] = 'close'
+			self._local.session = session
+			with self._lock:
+				self._sessions.add(session)
+		return session
+
+	# keyword arguments of Session.request that build the request, all others are passed on to Session.send
+	request_kwargs = frozenset({'params', 'data', 'headers', 'cookies', 'files', 'auth', 'json', 'hooks'})
+
+	def request(self, method: str, url: str, use_cache: bool = True, **kwargs) -> Response:
+		"""
+		:param use_cache: if False the response isn't served from or stored in the cache, e.g. because the caller needs the current state
+		"""
+		session = self.session()
+		if self.cache is None or not use_cache or kwargs.get('stream', False):
+			return session.request(method, url, **kwargs)
+
+		# mirrors Session.request, which doesn't let us intercept the prepared request
+		request = session.prepare_request(requests.Request(method, url, **{key: value for key, value in kwargs.items() if key in self.request_kwargs}))
+		send_kwargs = {key: value for key, value in kwargs.items() if key not in self.request_kwargs}
+		settings = session.merge_environment_settings(
+			request.url, send_kwargs.pop('proxies', None) or {}, send_kwargs.pop('stream', None), send_kwargs.pop('verify', None), send_kwargs.pop('cert', None)
+		)
+		send_kwargs.setdefault('allow_redirects', True)
+		send_kwargs.update(settings)
+		return self.cache.fetch(request, lambda prepared: session.send(prepared, **send_kwargs))
+
+	def get(self, url: str, **kwargs) -> Response:
+		return self.request("GET", url, **kwargs)
+
+	def post(self, url: str, **kwargs) -> Response:
+		return self.request("POST", url, **kwargs)
+
+	def head(self, url: str, **kwargs) -> Response:
+		return self.request("HEAD", url, **kwargs)
+
+	def close(self):
+		with self._lock:
+			for session in list(self._sessions):
+				session.close()
+			self._sessions.clear()
+		self._local = threading.local()
+		self._adapter.close()
+
+
+class ProjectSlugIndex:
+	"""
+	Persistent sqlite-backed mapping of project slugs to project ids.
+	The id of a project never changes, thus entries never expire.
+	"""
+
+	def __init__(self, db_path: str = "slug_index.db"):
+		self.db_path = db_path
+		self._db: Optional[sqlite3.Connection] = None
+		self._lock = threading.Lock()
+
+	def _connect(self) -> sqlite3.Connection:
+		if self._db is None:
+			self._db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+			self._db.execute("CREATE TABLE IF NOT EXISTS slug (game_id INTEGER NOT NULL, slug TEXT NOT NULL, project_id INTEGER NOT NULL, PRIMARY KEY (game_id, slug))")
+			self._db.commit()
+		return self._db
+
+	def close(self):
+		with self._lock:
+			if self._db is not None:
+				self._db.close()
+				self._db = None
+
+	def get_ids(self, game_id: int, slugs: List[str]) -> Dict[str, int]:
+		"""
+		:return: mapping of the known slugs to their project id
+		"""
+		project_ids = {}
+		with self._lock:
+			db = self._connect()
+			unique_slugs = list(dict.fromkeys(slugs))
+			for i in range(0, len(unique_slugs), 500):
+				chunk = unique_slugs[i:i + 500]
+				query = f"SELECT slug, project_id FROM slug WHERE game_id = ? AND slug IN ({', '.join('?' * len(chunk))})"
+				project_ids.update(db.execute(query, (game_id, *chunk)).fetchall())
+		return project_ids
+
+	def put_ids(self, game_id: int, project_ids: Dict[str, int]):
+		with self._lock:
+			db = self._connect()
+			db.executemany("INSERT OR REPLACE INTO slug (game_id, slug, project_id) VALUES (?, ?, ?)", [(game_id, slug, _id) for slug, _id in project_ids.items()])
+			db.commit()
+
+
+class BulkResult:
+	"""Merged result of a bulk request that was split into several chunks"""
+
+	def __init__(self):
+		self.data: List[dict] = []
+		self.errors: List[Tuple[List[int], requests.RequestException]] = []
+
+	@property
+	def failed_ids(self) -> List[int]:
+		return [_id for ids, _ in self.errors for _id in ids]
+
+	def __bool__(self):
+		return len(self.errors) == 0
+
 
 class CFCoreApi:
 	"""A simple helper class for the CurseForge Core API"""
@@ -11,14 +172,28 @@ class CFCoreApi:
 	base_url: str = "https://api.curseforge.com"
 	edge_cdn_url: str = "https://edge.forgecdn.net"
 	timeout: float = None
+	http: HttpSessionPool = None
+	max_workers: int = 8
+	bulk_chunk_size: int = 500
+	slug_index: Optional[ProjectSlugIndex] = None
 
 	game_ids: dict = {
 		"minecraft": 432,
 	}
 
-	def __init__(self, api_key, timeout: float = None):
+	def __init__(self, api_key, timeout: float = None, http: HttpSessionPool = None, max_workers: int = 8, slug_index: ProjectSlugIndex = None):
+		"""
+		:param api_key:
+		:param timeout:
+		:param http: shared connection pool, a new one is created if None
+		:param max_workers: max number of requests that are sent concurrently by methods that fan out (e.g. paginated requests)
+		:param slug_index: persistent slug to project id mapping used by find_minecraft_projects_by_slugs
+		"""
 		self._api_key = api_key
 		self.timeout = timeout
+		self.http = http if http else HttpSessionPool()
+		self.max_workers = max_workers
+		self.slug_index = slug_index
 
 	def _get_standard_headers(self) -> dict:
 		return {
@@ -27,7 +202,7 @@ class CFCoreApi:
 		}
 
 	def get_project(self, project_id: int) -> Response:
-		return requests.get(f'{self.base_url}/v1/mods/{project_id}', headers=self._get_standard_headers(), timeout=self.timeout)
+		return self.http.get(f'{self.base_url}/v1/mods/{project_id}', headers=self._get_standard_headers(), timeout=self.timeout)
 
 	def get_projects(self, project_ids: List[int]) -> Response:
 		headers = {
@@ -35,10 +210,10 @@ class CFCoreApi:
 			'Accept': 'application/json',
 			'x-api-key': self._api_key
 		}
-		return requests.post(f'{self.base_url}/v1/mods', headers=headers, json={"modIds": project_ids}, timeout=self.timeout)
+		return self.http.post(f'{self.base_url}/v1/mods', headers=headers, json={"modIds": project_ids}, timeout=self.timeout)
 
 	def find_project(self, query: dict) -> Response:
-		return requests.get(f'{self.base_url}/v1/mods/search', headers=self._get_standard_headers(), params=query, timeout=self.timeout)
+		return self.http.get(f'{self.base_url}/v1/mods/search', headers=self._get_standard_headers(), params=query, timeout=self.timeout)
 
 	def find_minecraft_project(self, query: dict) -> Response:
 		query['gameId'] = self.game_ids['minecraft']
@@ -52,39 +227,57 @@ class CFCoreApi:
 		query = {'gameId': self.game_ids['minecraft'], 'slug': project_slug}
 		return self.find_project(query)
 
-	def find_minecraft_projects_by_slugs(self, project_slugs: List[str]):
-		url = f'{self.base_url}/v1/mods/search'
-		headers = self._get_standard_headers()
-		query = {'gameId': self.game_ids['minecraft'], 'slug': ""}
+	def get_edge_cdn_url(self, file_id: int, file_name: str) -> str:
+		"""
+		Builds the edge CDN download url of the file
+		"""
+		fid = str(file_id)
+		f = furl(self.edge_cdn_url)
+		f.path.segments = [*f.path.segments, 'files', fid[0:4], fid[4:], file_name]
+		return f.url
+
+	def _find_minecraft_project_id_by_slug(self, slug: str) -> Optional[int]:
+		try:
+			response = self.find_minecraft_project_by_slug(slug)
+			response.raise_for_status()
+		except requests.RequestException:
+			return None
+
+		matches = {match["slug"]: match["id"] for match in response.json()["data"]}
+		return matches.get(slug)
 
-		with requests.Session() as session:
-			for slug in project_slugs:
-				try:
-					query["slug"] = slug
-					response = session.get(url, headers=headers, params=query, timeout=self.timeout)
-					response.raise_for_status()
-				except requests.RequestException:
-					yield slug, None
-					continue
-
-				matches = response.json()["data"]
-				for match in matches:
-					if match["slug"] == slug:
-						yield slug, match["id"]
-						break
+	def find_minecraft_projects_by_slugs(self, project_slugs: List[str]) -> Dict[str, Optional[int]]:
+		"""
+		Find the project ids of the given slugs.
+		Slugs are looked up in the slug index first, the remaining slugs are searched concurrently and added to the index.
+		:return: mapping of slug to project id, the id is None if the project couldn't be found
+		"""
+		game_id = self.game_ids['minecraft']
+		project_ids: Dict[str, Optional[int]] = self.slug_index.get_ids(game_id, project_slugs) if self.slug_index else {}
+		misses = [slug for slug in dict.fromkeys(project_slugs) if project_ids.get(slug) is None]
+
+		if len(misses) > 0:
+			with ThreadPoolExecutor(max_workers=min(self.max_workers, len(misses))) as executor:
+				found = dict(zip(misses, executor.map(self._find_minecraft_project_id_by_slug, misses)))
+			if self.slug_index:
+				self.slug_index.put_ids(game_id, {slug: _id for slug, _id in found.items() if _id is not None})
+			project_ids.update(found)
+
+		return {slug: project_ids.get(slug) for slug in project_slugs}
 
 	def get_project_desc(self, project_id: int) -> Response:
-		return requests.get(f'{self.base_url}/v1/mods/{project_id}/description', headers=self._get_standard_headers(), timeout=self.timeout)
+		return self.http.get(f'{self.base_url}/v1/mods/{project_id}/description', headers=self._get_standard_headers(), timeout=self.timeout)
 
 	def get_project_file(self, project_id: int, file_id: int) -> Response:
 		"""
 		Get one project file by file id
 		"""
-		return requests.get(f'{self.base_url}/v1/mods/{project_id}/files/{file_id}', headers=self._get_standard_headers(), timeout=self.timeout)
+		return self.http.get(f'{self.base_url}/v1/mods/{project_id}/files/{file_id}', headers=self._get_standard_headers(), timeout=self.timeout)
 
-	def get_project_files(self, project_id: int, index: int, page_size: int = 50):
+	def get_project_files(self, project_id: int, index: int, page_size: int = 50, use_cache: bool = True):
 		"""
 		Get files of the given project from a specified index/page
+		:param use_cache: if False the page isn't served from the response cache
 		"""
 		if page_size > 50:
 			raise ValueError(f"page_size {page_size} is larger than maximum of 50")
@@ -93,29 +286,57 @@ class CFCoreApi:
 			raise ValueError(f"sum of index and page_size is {index + page_size} which is larger than the limit of 10,000")
 
 		url = f'{self.base_url}/v1/mods/{project_id}/files'
-		return requests.get(url, params={"index": index, "pageSize": page_size}, headers=self._get_standard_headers(), timeout=self.timeout)
+		return self.http.get(url, params={"index": index, "pageSize": page_size}, headers=self._get_standard_headers(), timeout=self.timeout, use_cache=use_cache)
 
-	def _get_project_files(self, session: requests.Session, project_id: int):
-		url = f'{self.base_url}/v1/mods/{project_id}/files'
-		curr_index = 0
-		last_index = 0
-		while curr_index <= last_index:
-			response = session.get(url, params={"index": curr_index}, headers=self._get_standard_headers(), timeout=self.timeout)
-			response.raise_for_status()
-			page = response.json()
-			last_index = page["pagination"]["totalCount"] - 1
-			curr_index = page["pagination"]["index"] + page["pagination"]["resultCount"]
-			yield page["data"]
+	def _get_project_files_page(self, project_id: int, index: int, page_size: int, use_cache: bool = True) -> dict:
+		response = self.get_project_files(project_id, index, page_size, use_cache)
+		response.raise_for_status()
+		return response.json()
 
-	def get_all_project_files(self, project_id: int) -> List[dict]:
+	def iter_all_project_files(self, project_id: int, page_size: int = 50, use_cache: bool = True) -> Iterator[dict]:
+		"""
+		Streams all files of the given project.
+		The first page tells us the total count, the remaining pages are then fetched concurrently and their files are yielded as soon as a page arrives.
+		Thus, the files are not yielded in the order the api lists them.
+		"""
+		page = self._get_project_files_page(project_id, 0, page_size, use_cache)
+		yield from page["data"]
+
+		total_count = min(page["pagination"]["totalCount"], 10000)  # the api doesn't serve files beyond an index of 10,000
+		indices = range(page["pagination"]["resultCount"], total_count, page_size)
+		if len(indices) == 0:
+			return
+
+		with ThreadPoolExecutor(max_workers=min(self.max_workers, len(indices))) as executor:
+			futures = [executor.submit(self._get_project_files_page, project_id, index, min(page_size, total_count - index), use_cache) for index in indices]
+			try:
+				for future in as_completed(futures):
+					yield from future.result()["data"]
+			finally:
+				for future in futures:
+					future.cancel()
+
+	def iter_project_files_newer_than(self, project_id: int, file_id: int, page_size: int = 50, use_cache: bool = True) -> Iterator[dict]:
+		"""
+		Streams the files of the given project whose id is larger than the given file id.
+		The files endpoint can't be sorted, it lists the newest files first by their date, which doesn't strictly follow the file ids.
+		Thus, every page is filtered as a whole and the pages are fetched one after another until a page contains no newer file.
+		"""
+		index = 0
+		while index < 10000:
+			page = self._get_project_files_page(project_id, index, min(page_size, 10000 - index), use_cache)
+			newer_files = [file for file in page["data"] if file["id"] > file_id]
+			yield from newer_files
+
+			index = page["pagination"]["index"] + page["pagination"]["resultCount"]
+			if len(newer_files) == 0 or page["pagination"]["resultCount"] == 0 or index >= page["pagination"]["totalCount"]:
+				return
+
+	def get_all_project_files(self, project_id: int, use_cache: bool = True) -> List[dict]:
 		"""
 		Get all files of the given project
 		"""
-		with requests.Session() as session:
-			all_files = []
-			for files in self._get_project_files(session, project_id):
-				all_files = [*all_files, *files]
-			return all_files
+		return list(self.iter_all_project_files(project_id, use_cache=use_cache))
 
 	def get_files(self, file_ids: List[int]) -> Response:
 		headers = {
@@ -123,16 +344,58 @@ class CFCoreApi:
 			'Accept': 'application/json',
 			'x-api-key': self._api_key
 		}
-		return requests.post(f'{self.base_url}/v1/mods/files', headers=headers, json={"fileIds": file_ids}, timeout=self.timeout)
+		return self.http.post(f'{self.base_url}/v1/mods/files', headers=headers, json={"fileIds": file_ids}, timeout=self.timeout)
+
+	def _post_chunk(self, path: str, key: str, ids: List[int]) -> List[dict]:
+		headers = {
+			'Content-Type': 'application/json',
+			'Accept': 'application/json',
+			'x-api-key': self._api_key
+		}
+		response = self.http.post(f'{self.base_url}{path}', headers=headers, json={key: ids}, timeout=self.timeout)
+		response.raise_for_status()
+		return response.json()["data"]
+
+	def _post_chunked(self, path: str, key: str, ids: List[int], chunk_size: int = None) -> BulkResult:
+		chunk_size = chunk_size if chunk_size else self.bulk_chunk_size
+		chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+		result = BulkResult()
+		if len(chunks) == 0:
+			return result
+
+		with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+			futures = [executor.submit(self._post_chunk, path, key, chunk) for chunk in chunks]
+			for chunk, future in zip(chunks, futures):  # keep the order of the chunks
+				try:
+					result.data.extend(future.result())
+				except requests.RequestException as error:
+					result.errors.append((chunk, error))
+		return result
+
+	def get_projects_chunked(self, project_ids: List[int], chunk_size: int = None) -> BulkResult:
+		"""
+		Get projects by ids, the ids are split into chunks which are requested concurrently.
+		Failed chunks are reported in the result without discarding the data of successful chunks.
+		"""
+		return self._post_chunked('/v1/mods', "modIds", project_ids, chunk_size)
+
+	def get_files_chunked(self, file_ids: List[int], chunk_size: int = None) -> BulkResult:
+		"""
+		Get files by ids, the ids are split into chunks which are requested concurrently.
+		Failed chunks are reported in the result without discarding the data of successful chunks.
+		"""
+		return self._post_chunked('/v1/mods/files', "fileIds", file_ids, chunk_size)
 
 
 class ModpackIndexApi:
 	"""A simple helper class for the Modpack Index API"""
 
 	base_url: str = "https://www.modpackindex.com/api"
+	http: HttpSessionPool = None
 
-	def __init__(self):
-		pass
+	def __init__(self, http: HttpSessionPool = None):
+		self.http = http if http else HttpSessionPool()
 
 	def _get_standard_headers(self) -> dict:
 		return {
@@ -140,10 +403,10 @@ class ModpackIndexApi:
 		}
 
 	def get_mod(self, mod_id: int) -> Response:
-		return requests.get(f'{self.base_url}/v1/mod/{mod_id}', headers=self._get_standard_headers(), timeout=5)
+		return self.http.get(f'{self.base_url}/v1/mod/{mod_id}', headers=self._get_standard_headers(), timeout=5)
 
 	def find_mods(self, query: dict) -> Response:
-		return requests.get(f'{self.base_url}/v1/mods', headers=self._get_standard_headers(), params=query, timeout=5)
+		return self.http.get(f'{self.base_url}/v1/mods', headers=self._get_standard_headers(), params=query, timeout=5)
 
 	def find_mods_by_name(self, name: str) -> Response:
 		query = {
@@ -152,16 +415,16 @@ class ModpackIndexApi:
 		}
 		return self.find_mods(query)
 
-	def get_mod_dependents(self, mod_id: int) -> Response:
-		"""Returns the mod-packs that include this mod"""
-		query = {'limit': '100', 'page': '1'}
-		return requests.get(f'{self.base_url}/v1/mod/{mod_id}/modpacks', headers=self._get_standard_headers(), params=query, timeout=5)
+	def get_mod_dependents(self, mod_id: int, page: int = 1, limit: int = 100) -> Response:
+		"""Returns one page of the mod-packs that include this mod"""
+		query = {'limit': str(limit), 'page': str(page)}
+		return self.http.get(f'{self.base_url}/v1/mod/{mod_id}/modpacks', headers=self._get_standard_headers(), params=query, timeout=5)
 
 	def get_modpack(self, modpack_id: int) -> Response:
-		return requests.get(f'{self.base_url}/v1/modpack/{modpack_id}', headers=self._get_standard_headers(), timeout=5)
+		return self.http.get(f'{self.base_url}/v1/modpack/{modpack_id}', headers=self._get_standard_headers(), timeout=5)
 
 	def get_modpack_dependencies(self, modpack_id: int) -> Response:
-		return requests.get(f'{self.base_url}/v1/modpack/{modpack_id}/mods', headers=self._get_standard_headers(), timeout=5)
+		return self.http.get(f'{self.base_url}/v1/modpack/{modpack_id}/mods', headers=self._get_standard_headers(), timeout=5)
 
 
 class ApiHelper:
@@ -169,21 +432,83 @@ class ApiHelper:
 
 	cf_api: CFCoreApi = None
 	mpi_api: ModpackIndexApi = None
+	http: HttpSessionPool = None
 
-	def __init__(self, cf_api_key):
-		self.cf_api = CFCoreApi(cf_api_key)
-		self.mpi_api = ModpackIndexApi()
+	def __init__(self, cf_api_key, pool_size: int = 10, keep_alive: bool = True, rate_limiter: RateLimiter = None, retry_policy: RetryPolicy = None, cache: ResponseCache = None, slug_index_path: Optional[str] = "slug_index.db"):
+		"""
+		:param cf_api_key: CurseForge Core API key
+		:param pool_size: max number of keep-alive connections per host
+		:param keep_alive: reuse connections between requests
+		:param rate_limiter: per host rate limits, uses the process-wide rate limiter if None
+		:param retry_policy: backoff of retried requests
+		:param cache: persistent cache for api responses, e.g. ResponseCache("http_cache.db"), closing it is left to the caller
+		:param slug_index_path: path of the persistent slug to project id index, the index is only opened when slugs are looked up
+		"""
+		self.http = HttpSessionPool(pool_size=pool_size, keep_alive=keep_alive, rate_limiter=rate_limiter, retry_policy=retry_policy, cache=cache)
+		self.slug_index = ProjectSlugIndex(slug_index_path) if slug_index_path else None
+		self.cf_api = CFCoreApi(cf_api_key, http=self.http, slug_index=self.slug_index)
+		self.mpi_api = ModpackIndexApi(http=self.http)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def close(self):
+		self.http.close()
+		if self.slug_index:
+			self.slug_index.close()
+
+	def _get_mod_dependents_page(self, mpi_id: int, page: int) -> dict:
+		response = self.mpi_api.get_mod_dependents(mpi_id, page)
+		response.raise_for_status()
+		return response.json()
+
+	def iter_cf_modpack_ids(self, mpi_id: int) -> Iterator[int]:
+		"""
+		Streams the unique CurseForge ids of the mod-packs that include the mod.
+		The first page tells us the page count, the remaining pages are then fetched concurrently.
+		Pages that fail after the first one are logged and skipped, so the ids of the other pages aren't lost.
+		:raises requests.RequestException: if the first page fails
+		"""
+		seen = set()
+
+		def unseen_ids(result: dict) -> Iterator[int]:
+			for mod_pack in result['data']:
+				curse_id = mod_pack['curse_info']['curse_id']
+				if curse_id not in seen:
+					seen.add(curse_id)
+					yield curse_id
+
+		result = self._get_mod_dependents_page(mpi_id, 1)
+		yield from unseen_ids(result)
+
+		last_page = int(result.get('meta', {}).get('last_page', 1))
+		pages = range(2, last_page + 1)
+		if len(pages) == 0:
+			return
+
+		with ThreadPoolExecutor(max_workers=min(self.cf_api.max_workers, len(pages))) as executor:
+			futures = {executor.submit(self._get_mod_dependents_page, mpi_id, page): page for page in pages}
+			try:
+				for future in as_completed(futures):
+					try:
+						result = future.result()
+					except requests.RequestException as error:
+						logger.error(f"Failed to query page {futures[future]} of the dependents of <{mpi_id}> -> ModpackIndex API: {error}")
+						continue
+					yield from unseen_ids(result)
+			finally:
+				for future in futures:
+					future.cancel()
 
 	def get_cf_modpack_ids(self, mpi_id) -> Optional[List[int]]:
-		response = self.mpi_api.get_mod_dependents(mpi_id)  # TODO: handle pagination
-		if response:
-			result = response.json()
-			if len(result['data']) > 0:
-				modpack_ids = []
-				for mod_pack in result['data']:
-					modpack_ids.append(mod_pack['curse_info']['curse_id'])
-				return modpack_ids
-		return None
+		try:
+			modpack_ids = list(self.iter_cf_modpack_ids(mpi_id))
+		except requests.RequestException:
+			return None
+		return modpack_ids if len(modpack_ids) > 0 else None
 
 	def get_mpi_id(self, cf_id: int, cf_name: str) -> Optional[int]:
 		response = self.mpi_api.find_mods_by_name(cf_name)
@@ -203,7 +528,295 @@ class ApiHelper:
 			return self.get_cf_modpack_ids(mpi_id)
 		return None
 
-	def get_mod_dependents_by_web_scrapping(self, cf_slug: str):
+	def iter_mod_dependents_from_mpi(self, cf_id: int, cf_name: str) -> Iterator[int]:
+		"""
+		Streams the unique CurseForge ids of the mod-packs that include the mod, nothing is yielded if the mod isn't known to the ModpackIndex
+		:raises requests.RequestException: if the first page of dependents fails
+		"""
+		mpi_id = self.get_mpi_id(cf_id, cf_name)
+		if mpi_id:
+			yield from self.iter_cf_modpack_ids(mpi_id)
+
+	def get_mod_dependents_by_web_scrapping(self, cf_slug: str) -> Dict[str, Optional[int]]:
 		import web_scrape_dependents as web
 		slugs: List[str] = web.get_slugs_of_projects_depending_on(cf_slug)
 		return self.cf_api.find_minecraft_projects_by_slugs(slugs)
+
+
+class AsyncHttpClient:
+	"""
+	asyncio counterpart of the HttpSessionPool, wraps one aiohttp ClientSession.
+	At most `max_in_flight` requests are awaited at the same time, further requests wait for a free slot.
+	Requests are throttled by the same (process-wide) rate limiter as the HttpSessionPool.
+
+	Requires the optional `aiohttp` package.
+	"""
+
+	def __init__(self, max_in_flight: int = 32, pool_size: int = 10, keep_alive_timeout: float = 15, timeout: float = None, rate_limiter: RateLimiter = None, retry_policy: RetryPolicy = None):
+		"""
+		:param max_in_flight: max number of concurrent requests
+		:param pool_size: max number of open connections per host
+		:param keep_alive_timeout: seconds an idle connection is kept open
+		:param timeout: total timeout of a single request in seconds
+		:param rate_limiter: per host rate limits, uses the process-wide rate limiter if None
+		:param retry_policy: backoff of retried requests
+		"""
+		self.max_in_flight = max_in_flight
+		self.pool_size = pool_size
+		self.keep_alive_timeout = keep_alive_timeout
+		self.timeout = timeout
+		self.rate_limiter: RateLimiter = rate_limiter if rate_limiter else get_shared_rate_limiter()
+		self.retry_policy: RetryPolicy = retry_policy if retry_policy else RetryPolicy()
+		self._session = None
+		self._semaphore: Optional[asyncio.Semaphore] = None
+
+	async def __aenter__(self):
+		await self.open()
+		return self
+
+	async def __aexit__(self, exc_type, exc_val, exc_tb):
+		await self.close()
+
+	async def open(self):
+		if self._session is not None:
+			return
+
+		import aiohttp
+		connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.pool_size, keepalive_timeout=self.keep_alive_timeout)
+		self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+		self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+	async def close(self):
+		if self._session is not None:
+			await self._session.close()
+			self._session = None
+
+	async def request_json(self, method: str, url: str, **kwargs) -> dict:
+		"""
+		Sends the request and returns the decoded json body
+		:raises aiohttp.ClientError: on connection errors and error status codes
+		"""
+		import aiohttp
+		await self.open()
+		host = requests.utils.urlparse(url).hostname
+		attempt = 0
+		async with self._semaphore:
+			while True:
+				delay = self.rate_limiter.reserve(host)
+				if delay > 0:
+					await asyncio.sleep(delay)
+
+				retry_after = None
+				try:
+					async with self._session.request(method, url, **kwargs) as response:
+						if response.status not in self.retry_policy.retry_status_codes or attempt >= self.retry_policy.max_retries:
+							response.raise_for_status()
+							self.rate_limiter.on_success(host)
+							return await response.json()
+
+						retry_after = parse_retry_after(response.headers.get('Retry-After'))
+						if response.status in self.retry_policy.throttle_status_codes:
+							self.rate_limiter.on_throttled(host, retry_after)
+				except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+					if attempt >= self.retry_policy.max_retries:
+						raise
+
+				await asyncio.sleep(self.retry_policy.get_delay(attempt, retry_after))
+				attempt += 1
+
+	async def get_json(self, url: str, **kwargs) -> dict:
+		return await self.request_json("GET", url, **kwargs)
+
+	async def post_json(self, url: str, **kwargs) -> dict:
+		return await self.request_json("POST", url, **kwargs)
+
+
+class AsyncCFCoreApi:
+	"""asyncio variant of the CFCoreApi, methods return the decoded json body instead of a Response"""
+
+	_api_key: str = None
+	base_url: str = CFCoreApi.base_url
+	game_ids: dict = CFCoreApi.game_ids
+	http: AsyncHttpClient = None
+
+	def __init__(self, api_key, http: AsyncHttpClient):
+		self._api_key = api_key
+		self.http = http
+
+	def _get_standard_headers(self) -> dict:
+		return {
+			'Accept': 'application/json',
+			'x-api-key': self._api_key
+		}
+
+	def _get_post_headers(self) -> dict:
+		return {
+			'Content-Type': 'application/json',
+			'Accept': 'application/json',
+			'x-api-key': self._api_key
+		}
+
+	async def get_project(self, project_id: int) -> dict:
+		return await self.http.get_json(f'{self.base_url}/v1/mods/{project_id}', headers=self._get_standard_headers())
+
+	async def get_projects(self, project_ids: List[int]) -> dict:
+		return await self.http.post_json(f'{self.base_url}/v1/mods', headers=self._get_post_headers(), json={"modIds": project_ids})
+
+	async def find_project(self, query: dict) -> dict:
+		return await self.http.get_json(f'{self.base_url}/v1/mods/search', headers=self._get_standard_headers(), params=query)
+
+	async def find_minecraft_project_by_slug(self, project_slug: str) -> dict:
+		query = {'gameId': self.game_ids['minecraft'], 'slug': project_slug}
+		return await self.find_project(query)
+
+	async def find_minecraft_projects_by_slugs(self, project_slugs: List[str]) -> Dict[str, Optional[int]]:
+		"""
+		Searches for all slugs concurrently
+		:return: mapping of slug to project id, the id is None if the project couldn't be found
+		"""
+		import aiohttp
+
+		async def find(slug: str) -> Optional[int]:
+			try:
+				result = await self.find_minecraft_project_by_slug(slug)
+			except aiohttp.ClientError:
+				return None
+			for match in result["data"]:
+				if match["slug"] == slug:
+					return match["id"]
+			return None
+
+		ids = await asyncio.gather(*[find(slug) for slug in project_slugs])
+		return dict(zip(project_slugs, ids))
+
+	async def get_project_file(self, project_id: int, file_id: int) -> dict:
+		return await self.http.get_json(f'{self.base_url}/v1/mods/{project_id}/files/{file_id}', headers=self._get_standard_headers())
+
+	async def get_project_files(self, project_id: int, index: int, page_size: int = 50) -> dict:
+		"""
+		Get files of the given project from a specified index/page
+		"""
+		if page_size > 50:
+			raise ValueError(f"page_size {page_size} is larger than maximum of 50")
+
+		if index + page_size > 10000:
+			raise ValueError(f"sum of index and page_size is {index + page_size} which is larger than the limit of 10,000")
+
+		url = f'{self.base_url}/v1/mods/{project_id}/files'
+		return await self.http.get_json(url, params={"index": index, "pageSize": page_size}, headers=self._get_standard_headers())
+
+	async def get_all_project_files(self, project_id: int, page_size: int = 50) -> List[dict]:
+		"""
+		Get all files of the given project, the remaining pages are requested concurrently after the first page
+		"""
+		page = await self.get_project_files(project_id, 0, page_size)
+		total_count = min(page["pagination"]["totalCount"], 10000)
+		indices = range(page["pagination"]["resultCount"], total_count, page_size)
+		pages = await asyncio.gather(*[self.get_project_files(project_id, index, min(page_size, total_count - index)) for index in indices])
+
+		all_files = list(page["data"])
+		for page in pages:
+			all_files.extend(page["data"])
+		return all_files
+
+	async def get_files(self, file_ids: List[int]) -> dict:
+		return await self.http.post_json(f'{self.base_url}/v1/mods/files', headers=self._get_post_headers(), json={"fileIds": file_ids})
+
+
+class AsyncModpackIndexApi:
+	"""asyncio variant of the ModpackIndexApi, methods return the decoded json body instead of a Response"""
+
+	base_url: str = ModpackIndexApi.base_url
+	http: AsyncHttpClient = None
+
+	def __init__(self, http: AsyncHttpClient):
+		self.http = http
+
+	def _get_standard_headers(self) -> dict:
+		return {
+			'Accept': 'application/json'
+		}
+
+	async def get_mod(self, mod_id: int) -> dict:
+		return await self.http.get_json(f'{self.base_url}/v1/mod/{mod_id}', headers=self._get_standard_headers())
+
+	async def find_mods(self, query: dict) -> dict:
+		return await self.http.get_json(f'{self.base_url}/v1/mods', headers=self._get_standard_headers(), params=query)
+
+	async def find_mods_by_name(self, name: str) -> dict:
+		query = {
+			'name': name,
+			'limit': '100', 'page': '1'
+		}
+		return await self.find_mods(query)
+
+	async def get_mod_dependents(self, mod_id: int, page: int = 1, limit: int = 100) -> dict:
+		"""Returns one page of the mod-packs that include this mod"""
+		query = {'limit': str(limit), 'page': str(page)}
+		return await self.http.get_json(f'{self.base_url}/v1/mod/{mod_id}/modpacks', headers=self._get_standard_headers(), params=query)
+
+	async def get_modpack(self, modpack_id: int) -> dict:
+		return await self.http.get_json(f'{self.base_url}/v1/modpack/{modpack_id}', headers=self._get_standard_headers())
+
+	async def get_modpack_dependencies(self, modpack_id: int) -> dict:
+		return await self.http.get_json(f'{self.base_url}/v1/modpack/{modpack_id}/mods', headers=self._get_standard_headers())
+
+
+class AsyncApiHelper:
+	"""
+	asyncio variant of the ApiHelper, has to be used as async context manager:
+
+	async with AsyncApiHelper(cf_api_key, max_in_flight=32) as api_helper:
+		files = await api_helper.cf_api.get_all_project_files(project_id)
+	"""
+
+	cf_api: AsyncCFCoreApi = None
+	mpi_api: AsyncModpackIndexApi = None
+	http: AsyncHttpClient = None
+
+	def __init__(self, cf_api_key, max_in_flight: int = 32, pool_size: int = 10, timeout: float = None, rate_limiter: RateLimiter = None, retry_policy: RetryPolicy = None):
+		"""
+		:param cf_api_key: CurseForge Core API key
+		:param max_in_flight: max number of concurrent requests
+		:param pool_size: max number of open connections per host
+		:param timeout: total timeout of a single request in seconds
+		:param rate_limiter: per host rate limits, uses the process-wide rate limiter if None
+		:param retry_policy: backoff of retried requests
+		"""
+		self.http = AsyncHttpClient(max_in_flight=max_in_flight, pool_size=pool_size, timeout=timeout, rate_limiter=rate_limiter, retry_policy=retry_policy)
+		self.cf_api = AsyncCFCoreApi(cf_api_key, self.http)
+		self.mpi_api = AsyncModpackIndexApi(self.http)
+
+	async def __aenter__(self):
+		await self.http.open()
+		return self
+
+	async def __aexit__(self, exc_type, exc_val, exc_tb):
+		await self.http.close()
+
+	async def get_cf_modpack_ids(self, mpi_id) -> Optional[List[int]]:
+		result = await self.mpi_api.get_mod_dependents(mpi_id)
+		last_page = int(result.get('meta', {}).get('last_page', 1))
+		pages = range(2, last_page + 1)
+		results = [result]
+		for page, page_result in zip(pages, await asyncio.gather(*[self.mpi_api.get_mod_dependents(mpi_id, page) for page in pages], return_exceptions=True)):
+			if isinstance(page_result, Exception):
+				logger.error(f"Failed to query page {page} of the dependents of <{mpi_id}> -> ModpackIndex API: {page_result}")
+			else:
+				results.append(page_result)
+
+		modpack_ids = dict.fromkeys(mod_pack['curse_info']['curse_id'] for result in results for mod_pack in result['data'])
+		return list(modpack_ids) if len(modpack_ids) > 0 else None
+
+	async def get_mpi_id(self, cf_id: int, cf_name: str) -> Optional[int]:
+		result = await self.mpi_api.find_mods_by_name(cf_name)
+		for mod in result['data']:
+			if mod['curse_info']['curse_id'] == cf_id:
+				return mod['id']
+		return None
+
+	async def get_mod_dependents_from_mpi(self, cf_id: int, cf_name: str) -> Optional[List[int]]:
+		mpi_id = await self.get_mpi_id(cf_id, cf_name)
+		if mpi_id:
+			return await self.get_cf_modpack_ids(mpi_id)
+		return None